@@ -0,0 +1,16 @@
+""" Seeded data shared by the seeder and the scenarios,
+it doesn't import the app not to read its settings.
+"""
+import random
+import string
+
+
+def generate_words(*,
+                   count: int,
+                   seed: int) -> list[str]:
+    rand = random.Random(seed)
+    words: set[str] = set()
+    while len(words) < count:
+        length = rand.randint(3, 12)
+        words.add(''.join(rand.choices(string.ascii_lowercase, k=length)))
+    return sorted(words)
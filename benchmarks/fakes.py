@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+""" Local stand-ins of RNC and rusvectores with configurable latency.
+
+RNC pages are replayed from RNC_PAGES_DIR ({page}.html, recorded from
+processing.ruscorpora.ru/search.xml) if it's given, otherwise pages of
+the same markup are generated for the requested word.
+"""
+import argparse
+import asyncio
+import html
+import random
+from pathlib import Path
+from typing import Optional
+
+from aiohttp import web
+
+
+EXAMPLES_PER_PAGE = 10
+
+
+def _rnc_example(word: str,
+                 page: int,
+                 num: int) -> str:
+    doc_url = f"search.xml?docid={page * EXAMPLES_PER_PAGE + num}&amp;mode=para"
+    return f"""
+<table class="para"><tr>
+<td class="para-lang">en</td>
+<td><li>Page {page}, example {num}: she <span class="g-em">{word}</span> it at last.
+<span class="doc">[Author {num}. Book {page} (2001)]</span>
+<a href="{doc_url}">doc</a> <span class="on">[disambiguated]</span></li></td>
+</tr><tr>
+<td class="para-lang">ru</td>
+<td><li>Страница {page}, пример {num}: она наконец <span class="g-em">сделала</span> это.
+<span class="doc">[Автор {num}. Книга {page} (2001)]</span>
+<a href="{doc_url}">doc</a> <span class="on">[disambiguated]</span></li></td>
+</tr></table>"""
+
+
+def generate_rnc_page(word: str,
+                      page: int,
+                      pages_count: int) -> str:
+    word = html.escape(word)
+    examples = ''.join(
+        _rnc_example(word, page, num)
+        for num in range(EXAMPLES_PER_PAGE)
+    )
+    pager = ' '.join(
+        f'<a href="search.xml?p={num}">{num + 1}</a>'
+        for num in range(pages_count)
+    )
+    return f"""<html><body><div class="content">
+<p class="res">Found: <span class="stat-number">{pages_count}</span> documents,
+<span class="stat-number">{pages_count * EXAMPLES_PER_PAGE}</span> contexts</p>
+<p class="pager">{pager}</p>
+<ol><li>{examples}</li></ol>
+</div></body></html>"""
+
+
+class FakeRNC:
+    def __init__(self,
+                 *,
+                 latency: float,
+                 pages_count: int,
+                 pages_dir: Optional[Path] = None) -> None:
+        self.latency = latency
+        self.pages_count = pages_count
+        self.pages = {}
+        if pages_dir is not None:
+            self.pages = {
+                int(path.stem): path.read_text('utf-8')
+                for path in pages_dir.glob('*.html')
+            }
+            self.pages_count = len(self.pages)
+
+    async def search(self,
+                     request: web.Request) -> web.Response:
+        await asyncio.sleep(self.latency)
+
+        page = int(request.query.get('p', 0))
+        # RNC redirects to the first page if the requested one doesn't exist
+        if page >= self.pages_count:
+            page = 0
+
+        if self.pages:
+            text = self.pages[page]
+        else:
+            word = request.query.get('lex1') or request.query.get('req', 'word')
+            text = generate_rnc_page(word, page, self.pages_count)
+        return web.Response(text=text, content_type='text/html')
+
+
+class FakeRusvectores:
+    def __init__(self,
+                 *,
+                 latency: float,
+                 synonyms_count: int = 10) -> None:
+        self.latency = latency
+        self.synonyms_count = synonyms_count
+
+    async def synonyms(self,
+                       request: web.Request) -> web.Response:
+        await asyncio.sleep(self.latency)
+
+        word = request.match_info['word']
+        rand = random.Random(word)
+        synonyms = {
+            f"{word}{num}_NOUN": round(rand.random(), 3)
+            for num in range(self.synonyms_count)
+        }
+        return web.json_response({
+            'tayga_upos_skipgram_300_2_2019': {f"{word}_NOUN": synonyms}
+        })
+
+
+def create_app(*,
+               rnc_latency: float,
+               rusvectores_latency: float,
+               pages_count: int,
+               pages_dir: Optional[Path] = None) -> web.Application:
+    rnc = FakeRNC(latency=rnc_latency, pages_count=pages_count, pages_dir=pages_dir)
+    rusvectores = FakeRusvectores(latency=rusvectores_latency)
+
+    app = web.Application()
+    app.router.add_get('/search.xml', rnc.search)
+    app.router.add_get('/tayga_upos_skipgram_300_2_2019/{word}/api/json/', rusvectores.synonyms)
+    return app
+
+
+def urls(host: str,
+         port: int) -> dict[str, str]:
+    """ Environment of the app to request the stand-ins """
+    return {
+        'RNC_URL': f"http://{host}:{port}/search.xml",
+        'SYNONYMS_SEARCH_URL': f"http://{host}:{port}/tayga_upos_skipgram_300_2_2019/{{word}}/api/json/"
+    }
+
+
+async def start(*,
+                host: str,
+                port: int,
+                **kwargs) -> web.AppRunner:
+    runner = web.AppRunner(create_app(**kwargs), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serve RNC and rusvectores stand-ins"
+    )
+    parser.add_argument('--host', type=str, default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--rnc-latency', type=float, default=0.3)
+    parser.add_argument('--rusvectores-latency', type=float, default=0.1)
+    parser.add_argument('--pages-count', type=int, default=10)
+    parser.add_argument('--pages-dir', type=Path, default=None)
+    args = parser.parse_args()
+
+    for name, url in urls(args.host, args.port).items():
+        print(f"{name}={url}")
+
+    web.run_app(
+        create_app(
+            rnc_latency=args.rnc_latency,
+            rusvectores_latency=args.rusvectores_latency,
+            pages_count=args.pages_count,
+            pages_dir=args.pages_dir
+        ),
+        host=args.host, port=args.port, access_log=None
+    )
+
+
+if __name__ == '__main__':
+    main()
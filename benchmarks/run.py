@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+""" Benchmark the app against local stand-ins of the upstreams.
+
+The benchmark database (BENCH_DB_NAME, see benchmarks.settings) is seeded,
+the app is run by uvicorn in a subprocess against it, every scenario is run by `concurrency`
+clients for `duration` seconds. p50/p99 latency and RPS are printed
+and dumped to --output to be compared with the next run by --compare.
+
+    python -m benchmarks.run --output bench-1.0.0.json
+    python -m benchmarks.run --compare bench-1.0.0.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import AsyncContextManager, Callable, Optional
+
+import aiohttp
+
+from benchmarks import fakes, settings
+from benchmarks.data import generate_words
+
+
+HOST = '127.0.0.1'
+# the upstreams are local, don't let the limiter be the bottleneck
+APP_ENV = {
+    'RATE_LIMIT_RNC_RATE': '100000',
+    'RATE_LIMIT_RNC_BURST': '100000',
+    'RATE_LIMIT_RNC_CONCURRENCY': '1000',
+    'RATE_LIMIT_RUSVECTORES_RATE': '100000',
+    'RATE_LIMIT_RUSVECTORES_BURST': '100000',
+    'RATE_LIMIT_RUSVECTORES_CONCURRENCY': '1000',
+    'LOGGER_LEVEL': 'warning',
+    # prefetching would warm the caches in the middle of the scenarios
+    'PREFETCH_CONCURRENCY': '0',
+}
+
+Request = Callable[[aiohttp.ClientSession, random.Random], AsyncContextManager[aiohttp.ClientResponse]]
+
+
+@dataclass
+class Result:
+    requests: int = 0
+    errors: int = 0
+    rps: float = 0
+    p50_ms: float = 0
+    p99_ms: float = 0
+    latencies: list[float] = field(default_factory=list, repr=False)
+
+    def summarize(self,
+                  elapsed: float) -> None:
+        latencies = sorted(self.latencies)
+        self.requests = len(latencies)
+        self.rps = round(self.requests / elapsed, 1)
+        if latencies:
+            self.p50_ms = round(_percentile(latencies, 50) * 1000, 2)
+            self.p99_ms = round(_percentile(latencies, 99) * 1000, 2)
+
+    def to_dict(self) -> dict:
+        result = asdict(self)
+        result.pop('latencies')
+        return result
+
+
+def _percentile(sorted_values: list[float],
+                percent: int) -> float:
+    index = round(percent / 100 * (len(sorted_values) - 1))
+    return sorted_values[index]
+
+
+def scenarios(words: list[str],
+              *,
+              pages_count: int) -> dict[str, Request]:
+    hot_words = words[:10]
+
+    def corpus_hot(ses, rand):
+        return ses.get(f"/examples/corpus/{rand.choice(hot_words)}",
+                       params={'pages_count': pages_count, 'lang': 'en'})
+
+    cold_words = iter(words[10:])
+
+    def corpus_cold(ses, rand):
+        # every word is requested from the RNC stand-in once
+        return ses.get(f"/examples/corpus/{next(cold_words)}",
+                       params={'pages_count': pages_count, 'lang': 'en'})
+
+    def linked_words(ses, rand):
+        return ses.get(f"/words/linked-words/{rand.choice(words[:100])}")
+
+    def to_learn_list(ses, rand):
+        return ses.get("/words/to-learn/list",
+                       params={'p': rand.randint(1, 20), 'page_size': 50})
+
+    def view(ses, rand):
+        return ses.post("/view/", json=rand.choice(hot_words))
+
+    return {
+        'corpus-hot': corpus_hot,
+        'corpus-cold': corpus_cold,
+        'linked-words': linked_words,
+        'to-learn-list': to_learn_list,
+        'view': view,
+    }
+
+
+async def _client(ses: aiohttp.ClientSession,
+                  request: Request,
+                  result: Result,
+                  *,
+                  seed: int,
+                  deadline: float) -> None:
+    rand = random.Random(seed)
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            async with request(ses, rand) as resp:
+                await resp.read()
+                ok = resp.status < 400
+        except StopIteration:
+            return
+        except aiohttp.ClientError:
+            ok = False
+
+        result.latencies.append(time.perf_counter() - start)
+        result.errors += not ok
+
+
+async def run_scenario(base_url: str,
+                       request: Request,
+                       *,
+                       concurrency: int,
+                       duration: float,
+                       seed: int) -> Result:
+    result = Result()
+    connector = aiohttp.TCPConnector(limit=concurrency)
+
+    async with aiohttp.ClientSession(base_url, connector=connector) as ses:
+        start = time.monotonic()
+        await asyncio.gather(*(
+            _client(ses, request, result, seed=seed + num, deadline=start + duration)
+            for num in range(concurrency)
+        ))
+        result.summarize(time.monotonic() - start)
+
+    return result
+
+
+def _run(*args: str,
+         env: dict[str, str]) -> None:
+    subprocess.run([sys.executable, '-m', *args], env=env, check=True)
+
+
+async def _wait_ready(base_url: str,
+                      timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession(base_url) as ses:
+        while time.monotonic() < deadline:
+            try:
+                async with ses.get('/health') as resp:
+                    if resp.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError(f"The app isn't ready in {timeout}s")
+
+
+def _print_report(results: dict[str, dict],
+                  previous: Optional[dict[str, dict]]) -> None:
+    print(f"{'scenario':<16}{'requests':>10}{'errors':>8}{'rps':>10}{'p50, ms':>10}{'p99, ms':>10}")
+    for name, result in results.items():
+        line = f"{name:<16}{result['requests']:>10}{result['errors']:>8}" \
+               f"{result['rps']:>10}{result['p50_ms']:>10}{result['p99_ms']:>10}"
+        if previous and (before := previous.get(name)) and before['rps']:
+            line += f"   rps {(result['rps'] / before['rps'] - 1) * 100:+.1f}%," \
+                    f" p99 {result['p99_ms'] - before['p99_ms']:+.2f}ms"
+        print(line)
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark the app with local upstream stand-ins"
+    )
+    parser.add_argument('--scenarios', nargs='*', default=None,
+                        help="All the scenarios by default")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--rnc-latency', type=float, default=0.3)
+    parser.add_argument('--rusvectores-latency', type=float, default=0.1)
+    parser.add_argument('--pages-count', type=int, default=5)
+    parser.add_argument('--pages-dir', type=Path, default=None,
+                        help="Recorded RNC pages, {page}.html")
+    parser.add_argument('--words-count', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--no-seed', action='store_true',
+                        help="Don't reseed the database")
+    parser.add_argument('--app-port', type=int, default=9200)
+    parser.add_argument('--fakes-port', type=int, default=9100)
+    parser.add_argument('--output', type=Path, default=None)
+    parser.add_argument('--compare', type=Path, default=None,
+                        help="Output of the previous run")
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        **APP_ENV,
+        **fakes.urls(HOST, args.fakes_port),
+        'API_HOST': HOST,
+        'API_PORT': str(args.app_port),
+    }
+    # exits if the benchmark database is the app's one
+    db_env = settings.app_env()
+    if not args.no_seed:
+        # the seeder compares its database with the app's one itself
+        _run('benchmarks.seed', '--words-count', str(args.words_count), '--seed', str(args.seed), env=env)
+    # the same words as seeded
+    words = generate_words(count=args.words_count, seed=args.seed)
+
+    fakes_runner = await fakes.start(
+        host=HOST, port=args.fakes_port,
+        rnc_latency=args.rnc_latency,
+        rusvectores_latency=args.rusvectores_latency,
+        pages_count=args.pages_count,
+        pages_dir=args.pages_dir
+    )
+    app = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'vocabulary.main:app',
+         '--host', HOST, '--port', str(args.app_port), '--log-level', 'warning'],
+        env={**env, **db_env}
+    )
+    base_url = f"http://{HOST}:{args.app_port}"
+    try:
+        await _wait_ready(base_url)
+
+        requests = scenarios(words, pages_count=args.pages_count)
+        results = {}
+        for name in args.scenarios or requests:
+            print(f"Running '{name}' for {args.duration}s", file=sys.stderr)
+            result = await run_scenario(
+                base_url, requests[name],
+                concurrency=args.concurrency, duration=args.duration, seed=args.seed)
+            results[name] = result.to_dict()
+    finally:
+        app.terminate()
+        app.wait()
+        await fakes_runner.cleanup()
+
+    previous = None
+    if args.compare:
+        previous = json.loads(args.compare.read_text())['scenarios']
+    _print_report(results, previous)
+
+    if args.output:
+        meta = {key: str(value) for key, value in vars(args).items()}
+        args.output.write_text(json.dumps({'meta': meta, 'scenarios': results}, indent=2))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
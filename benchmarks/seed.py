@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+""" Seed the benchmark database with the same words for every run.
+
+The database is BENCH_DB_NAME, never the app's one, see benchmarks.settings.
+It's created if it doesn't exist, so are the tables. Words to learn,
+cached synonyms and corpus examples are removed.
+"""
+import argparse
+import asyncio
+
+import sqlalchemy.sql as sa
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from benchmarks import settings
+from benchmarks.data import generate_words
+from vocabulary.common.log import logger
+from vocabulary.models import models
+
+
+def _dsn(name: str) -> str:
+    return f"postgresql+asyncpg://{settings.BENCH_DB_USERNAME}:{settings.BENCH_DB_PASSWORD}@" \
+           f"{settings.BENCH_DB_HOST}:{settings.BENCH_DB_PORT}/{name}"
+
+
+async def create_database() -> None:
+    engine = create_async_engine(_dsn('postgres'), isolation_level='AUTOCOMMIT')
+    try:
+        async with engine.connect() as conn:
+            exists = await conn.scalar(
+                sa.text("SELECT 1 FROM pg_database WHERE datname = :name"),
+                {'name': settings.BENCH_DB_NAME}
+            )
+            if not exists:
+                name = conn.dialect.identifier_preparer.quote(settings.BENCH_DB_NAME)
+                await conn.execute(sa.text(f"CREATE DATABASE {name}"))
+                logger.info("Database %s created", settings.BENCH_DB_NAME)
+    finally:
+        await engine.dispose()
+
+
+async def seed(*,
+               words_count: int,
+               seed: int,
+               batch_size: int = 5000) -> list[str]:
+    settings.check_database()
+    await create_database()
+    words = generate_words(count=words_count, seed=seed)
+
+    engine = create_async_engine(_dsn(str(settings.BENCH_DB_NAME)))
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(models.metadata.create_all)
+            for table in (models.WordToLearn, models.LinkedWords, models.CorpusExamples):
+                await conn.execute(table.delete())
+
+            for start in range(0, len(words), batch_size):
+                values = [{'word': word} for word in words[start:start + batch_size]]
+                await conn.execute(
+                    insert(models.WordToLearn).values(values).on_conflict_do_nothing())
+    finally:
+        await engine.dispose()
+
+    logger.info("%s words seeded", len(words))
+    return words
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Seed the benchmark database, BENCH_DB_NAME"
+    )
+    parser.add_argument('--words-count', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    await seed(words_count=args.words_count, seed=args.seed)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+""" The database of the benchmarks, it's wiped by every seeding.
+
+BENCH_DB_NAME is required, the host, port and credentials are the
+same as the app's ones by default. The app's database is refused.
+"""
+from typing import Optional
+
+from environs import Env
+
+
+env = Env()
+env.read_env()
+
+with env.prefixed('DB_'):
+    _APP_DB_HOST: Optional[str] = env('HOST', None)
+    _APP_DB_PORT: Optional[int] = env.int('PORT', None)
+    _APP_DB_NAME: Optional[str] = env('NAME', None)
+    _APP_DB_USERNAME: Optional[str] = env('USERNAME', None)
+    _APP_DB_PASSWORD: Optional[str] = env('PASSWORD', None)
+
+with env.prefixed('BENCH_DB_'):
+    BENCH_DB_HOST = env('HOST', _APP_DB_HOST)
+    BENCH_DB_PORT = env.int('PORT', _APP_DB_PORT)
+    BENCH_DB_USERNAME = env('USERNAME', _APP_DB_USERNAME)
+    BENCH_DB_PASSWORD = env('PASSWORD', _APP_DB_PASSWORD)
+    BENCH_DB_NAME: Optional[str] = env('NAME', None)
+
+
+def check_database() -> None:
+    """ :exception SystemExit: if the database isn't set or it's the app's one. """
+    if not BENCH_DB_NAME:
+        raise SystemExit("Set BENCH_DB_NAME, the benchmarks wipe their database")
+    if None in (BENCH_DB_HOST, BENCH_DB_PORT, BENCH_DB_USERNAME, BENCH_DB_PASSWORD):
+        raise SystemExit("Set BENCH_DB_HOST, BENCH_DB_PORT, BENCH_DB_USERNAME and BENCH_DB_PASSWORD")
+    if (BENCH_DB_HOST, BENCH_DB_PORT, BENCH_DB_NAME) == (_APP_DB_HOST, _APP_DB_PORT, _APP_DB_NAME):
+        raise SystemExit(f"{BENCH_DB_NAME!r} is the database of the app, set another BENCH_DB_NAME")
+
+
+def app_env() -> dict[str, str]:
+    """ Point the app under benchmark at the database """
+    check_database()
+    return {
+        'DB_HOST': str(BENCH_DB_HOST),
+        'DB_PORT': str(BENCH_DB_PORT),
+        'DB_USERNAME': str(BENCH_DB_USERNAME),
+        'DB_PASSWORD': str(BENCH_DB_PASSWORD),
+        'DB_NAME': str(BENCH_DB_NAME),
+    }
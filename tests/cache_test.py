@@ -0,0 +1,136 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from vocabulary.common import cache as cache_module, settings
+from vocabulary.common.cache import LRUCache, SharedCache
+
+
+def test_lru_eviction():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set('a', 1)
+    cache.set('b', 2)
+
+    # 'a' becomes the most recently used
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.stats == {
+        'size': 2, 'hits': 3, 'misses': 1, 'evictions': 1
+    }
+
+
+def test_ttl_expiration():
+    cache = LRUCache(maxsize=2, ttl=0.01)
+    cache.set('a', 1)
+    time.sleep(0.02)
+
+    assert cache.get('a', 'default') == 'default'
+    assert len(cache) == 0
+    assert cache.misses == 1
+
+
+def test_zero_size_disables_caching():
+    cache = LRUCache(maxsize=0, ttl=60)
+    cache.set('a', 1)
+
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_shared_cache(tmp_path):
+    cache = SharedCache(tmp_path / 'test.cache', maxsize=16, ttl=60, slot_size=256)
+    cache.set(('word', 'en', 5), ['example'])
+    cache.set('synonyms', ('a', 'b'))
+
+    assert cache.get(('word', 'en', 5)) == ['example']
+    assert cache.get('synonyms') == ('a', 'b')
+    assert cache.get('missing', 'default') == 'default'
+    assert len(cache) == 2
+
+    cache.pop('synonyms')
+    assert cache.get('synonyms') is None
+    # bigger than a slot
+    cache.set('big', os.urandom(1024))
+    assert cache.get('big') is None
+    assert cache.stats == {
+        'size': 1, 'hits': 2, 'misses': 3, 'evictions': 0
+    }
+
+
+def test_shared_cache_eviction(tmp_path):
+    cache = SharedCache(tmp_path / 'test.cache', maxsize=2, ttl=60, slot_size=256, ways=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    time.sleep(0.01)
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+    assert cache.evictions == 1
+
+
+def _set_in_child(path):
+    SharedCache(path, maxsize=16, ttl=60, slot_size=256).set('key', 'from child')
+
+
+def test_shared_cache_across_processes(tmp_path):
+    path = tmp_path / 'test.cache'
+    cache = SharedCache(path, maxsize=16, ttl=60, slot_size=256)
+    assert cache.get('key') is None
+
+    process = multiprocessing.get_context('fork').Process(target=_set_in_child, args=(path, ))
+    process.start()
+    process.join()
+
+    assert process.exitcode == 0
+    assert cache.get('key') == 'from child'
+
+
+def test_shared_cache_refuses_files_accessible_to_others(tmp_path):
+    path = tmp_path / 'test.cache'
+    path.touch(mode=0o666)
+    path.chmod(0o666)
+
+    with pytest.raises(PermissionError):
+        SharedCache(path, maxsize=16, ttl=60, slot_size=256).get('key')
+
+    link = tmp_path / 'link.cache'
+    link.symlink_to(tmp_path / 'target.cache')
+    with pytest.raises(OSError):
+        SharedCache(link, maxsize=16, ttl=60, slot_size=256).get('key')
+    assert not (tmp_path / 'target.cache').exists()
+
+
+def test_shared_cache_refuses_another_layout(tmp_path):
+    path = tmp_path / 'test.cache'
+    SharedCache(path, maxsize=16, ttl=60, slot_size=256).set('key', 'value')
+    size = path.stat().st_size
+
+    with pytest.raises(ValueError):
+        SharedCache(path, maxsize=32, ttl=60, slot_size=256).get('key')
+
+    assert path.stat().st_size == size
+    assert SharedCache(path, maxsize=16, ttl=60, slot_size=256).get('key') == 'value'
+
+
+def test_shared_caches_are_in_private_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, 'CACHE_BACKEND', 'shared')
+    monkeypatch.setattr(settings, 'CACHE_SHARED_DIR', str(tmp_path))
+
+    cache = cache_module.create_cache('test', maxsize=16, ttl=60, slot_size=256)
+    cache.set('key', 'value')
+
+    assert cache.path.parent.stat().st_mode & 0o777 == 0o700
+    assert cache.path.stat().st_mode & 0o777 == 0o600
+
+    cache.path.parent.chmod(0o755)
+    with pytest.raises(PermissionError):
+        cache_module.create_cache('test', maxsize=16, ttl=60, slot_size=256)
@@ -1,7 +1,13 @@
+import asyncio
+import json
+import typing
+
 import pytest
 import rnc
 from fastapi.testclient import TestClient
 
+from vocabulary.common import breaker, settings
+from vocabulary.examples import db, records, schemas, texts
 from vocabulary.main import app
 
 
@@ -62,7 +68,8 @@ def test_custom_lang_query(sleep):
     "pages_count,lang", [
         (1, 'shue'),
         ('ff', 'en'),
-        (0, 'en')
+        (0, 'en'),
+        (settings.RATE_LIMIT_RNC_BURST + 1, 'en')
     ]
 )
 def test_invalid_lang(pages_count, lang):
@@ -77,3 +84,160 @@ def test_examples_is_sorted(sleep):
 
     for ex_index in range(1, json['count']):
         assert len(corp_ex[ex_index - 1]) <= len(corp_ex[ex_index])
+
+
+def test_text_is_split_to_sentences_while_reading():
+    text = "Привет, мир! It's a well-known fact.\nThe \"end\"? Yes… last one"
+
+    async def chunks(size):
+        data = text.encode()
+        for start in range(0, len(data), size):
+            yield data[start:start + size]
+
+    async def split(size):
+        return [
+            sentence
+            async for sentence in texts.split_sentences(chunks(size))
+        ]
+
+    expected = ['Привет, мир!', "It's a well-known fact.", 'The "end"?', 'Yes…', 'last one']
+    # chunks might split multibyte symbols
+    assert asyncio.run(split(1)) == expected
+    assert asyncio.run(split(1024)) == expected
+
+
+def test_text_without_punctuation_is_split_to_bounded_sentences():
+    words = ' '.join(['word'] * 100_000)
+
+    async def chunks(size):
+        data = words.encode()
+        for start in range(0, len(data), size):
+            yield data[start:start + size]
+
+    async def split():
+        return [
+            sentence
+            async for sentence in texts.split_sentences(chunks(64 * 1024))
+        ]
+
+    sentences = asyncio.run(split())
+
+    assert max(map(len, sentences)) <= texts.MAX_SENTENCE_LENGTH
+    assert ' '.join(sentences) == words
+
+
+def test_word_forms():
+    assert texts.word_forms("It's a Well-known fact") == {
+        "it's", 'it', 's', 'a', 'well-known', 'well', 'known', 'fact'
+    }
+
+
+def test_corpus_example_record():
+    example = {
+        'original': 'I got it.',
+        'native': 'Я понял.',
+        'src': 'Source',
+        'ambiguation': 'disambiguated',
+        'doc_url': 'https://ruscorpora.ru/doc',
+        'found_wordforms': ['got']
+    }
+    record = records.CorpusExample.validate(example)
+
+    assert record.ambiguation is True
+    assert record.found_wordforms == ('got', )
+    # the examples stored before validating keep the RNC values
+    assert records.CorpusExample.from_stored(example) == record
+    assert records.CorpusExample.from_stored(record.to_dict()) == record
+
+    with pytest.raises(ValueError):
+        records.CorpusExample.validate({**example, 'doc_url': 'not url'})
+
+
+def test_dumped_examples_match_schema():
+    record = records.CorpusExample('Got it', 'Понял', 'src', False, 'https://ruscorpora.ru/doc', ('got', ))
+    body = records.dump_examples([record], 'en')
+
+    parsed = schemas.CorpusExamples.parse_raw(body)
+    assert parsed.count == 1
+    assert parsed.examples[0].original == 'Got it'
+    assert 'Понял'.encode() in body
+
+
+def test_corpus_page_existence():
+    def page(pages_count):
+        links = ' '.join(f'<a href="search.xml?p={num}">{num + 1}</a>' for num in range(pages_count))
+        return f'<html><body><div class="content"><p class="pager">{links}</p></div></body></html>'
+
+    first_page = page(3)
+    assert db._CorpusPages.exists(page(3), 2, first_page)
+    # RNC redirects to the first page
+    assert not db._CorpusPages.exists(first_page, 3, first_page)
+    # without a pager the redirect is found by the content
+    assert db._CorpusPages.exists('<p>second</p>', 1, '<p>first</p>')
+    assert not db._CorpusPages.exists('<p>first</p>', 1, '<p>first</p>')
+
+
+def test_languages_match_rnc():
+    rnc_languages = {
+        lang
+        for lang in rnc.mycorp.Parallel.__dict__
+        if lang[0].islower()
+    }
+    assert set(typing.get_args(schemas.LANGUAGES)) == rnc_languages
+
+
+def test_stream_fails_before_the_first_example(monkeypatch):
+    async def examples(**kwargs):
+        raise breaker.CircuitOpen('rnc')
+        yield
+
+    monkeypatch.setattr(db, 'stream_corpus_examples', examples)
+    resp = client.get('/examples/corpus/get/stream?pages_count=2')
+
+    assert resp.status_code == 503
+
+
+def test_stream_ends_with_the_error(monkeypatch):
+    example = records.CorpusExample('I got it', 'Я понял', 'src', True, 'https://example.com', ('got', ))
+
+    async def examples(**kwargs):
+        yield example
+        raise breaker.CircuitOpen('rnc')
+
+    monkeypatch.setattr(db, 'stream_corpus_examples', examples)
+    resp = client.get('/examples/corpus/get/stream?pages_count=2')
+
+    assert resp.status_code == 200
+    first, last = [json.loads(line) for line in resp.text.splitlines()]
+    assert first['original'] == 'I got it'
+    assert 'error' in last
+
+
+def test_sentences_are_indexed_by_allocated_ids():
+    executed = []
+
+    class Session:
+        async def execute(self, stmt):
+            executed.append(stmt)
+
+            class Result:
+                def scalars(self):
+                    return self
+
+                def all(self):
+                    return [11, 10]
+            return Result()
+
+    sentences = ['I got it.', 'Take this.']
+    asyncio.run(db._add_sentences(Session(), 'text-id', sentences))
+
+    _, sentences_insert, index_insert = [stmt.compile().params for stmt in executed]
+    assert sentences_insert['sentence_id_m0'] == 11
+    assert sentences_insert['sentence_m0'] == 'I got it.'
+    assert sentences_insert['sentence_id_m1'] == 10
+    index = {
+        index_insert[f"word_form_m{num}"]: index_insert[f"sentence_id_m{num}"]
+        for num in range(len(index_insert) // 2)
+    }
+    assert index['take'] == 10
+    assert index['got'] == 11
@@ -0,0 +1,69 @@
+import argparse
+import asyncio
+import sqlite3
+
+import pytest
+
+from vocabulary import migrator
+
+
+def _create_sqlite(path, words):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE words_to_learn (word TEXT)")
+    conn.executemany("INSERT INTO words_to_learn VALUES (?)", [(word, ) for word in words])
+    conn.commit()
+    conn.close()
+
+
+def test_words_are_streamed_in_batches(tmp_path):
+    path = tmp_path / 'eng.db'
+    words = [f"word{num}" for num in range(7)]
+    _create_sqlite(path, words)
+
+    batches = list(migrator.get_words_to_learn(path=path, batch_size=3))
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert [word for batch in batches for _, word in batch] == words
+
+    last_rowid = batches[0][-1][0]
+    resumed = migrator.get_words_to_learn(path=path, after=last_rowid, batch_size=10)
+    assert [word for batch in resumed for _, word in batch] == words[3:]
+
+
+def test_checkpoint_is_kept_per_source(tmp_path, monkeypatch):
+    monkeypatch.setattr(migrator, 'CHECKPOINT_DIR', tmp_path)
+    first = migrator.checkpoint_path(tmp_path / 'first.db')
+    second = migrator.checkpoint_path(tmp_path / 'second.db')
+
+    migrator.write_checkpoint(42, first)
+
+    assert first != second
+    assert migrator.read_checkpoint(first) == 42
+    assert migrator.read_checkpoint(second) == 0
+
+
+@pytest.mark.parametrize('value', ('0', '10001', 'many'))
+def test_invalid_batch_size(value):
+    with pytest.raises((argparse.ArgumentTypeError, ValueError)):
+        migrator.batch_size_arg(value)
+
+
+def test_migration_resumes_from_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(migrator, 'CHECKPOINT_DIR', tmp_path)
+    path = tmp_path / 'eng.db'
+    words = [f"word{num}" for num in range(5)]
+    _create_sqlite(path, words)
+
+    inserted = []
+
+    async def insert(batch):
+        inserted.extend(batch)
+        return len(batch)
+
+    monkeypatch.setattr(migrator, 'insert_words_to_learn', insert)
+    checkpoint = migrator.checkpoint_path(path)
+    migrator.write_checkpoint(2, checkpoint)
+
+    asyncio.run(migrator.migrate_words_to_learn(path=path, batch_size=2))
+
+    assert inserted == words[2:]
+    assert not checkpoint.exists()
@@ -0,0 +1,133 @@
+import asyncio
+
+import pytest
+
+from vocabulary.common.singleflight import SingleFlight
+
+
+def test_concurrent_calls_are_coalesced():
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 'result'
+
+    async def main():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(
+            flight.do('key', upstream)
+            for _ in range(5)
+        ))
+        return flight, results
+
+    flight, results = asyncio.run(main())
+
+    assert results == ['result'] * 5
+    assert calls == 1
+    assert flight.coalesced == 4
+    assert len(flight) == 0
+
+
+def test_cancelled_caller_does_not_cancel_others():
+    async def upstream():
+        await asyncio.sleep(0.01)
+        return 'result'
+
+    async def main():
+        flight = SingleFlight()
+        first = asyncio.create_task(flight.do('key', upstream))
+        second = asyncio.create_task(flight.do('key', upstream))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    assert asyncio.run(main()) == 'result'
+
+
+def test_call_is_cancelled_without_waiters():
+    async def main():
+        flight = SingleFlight()
+        upstream_cancelled = False
+
+        async def upstream():
+            nonlocal upstream_cancelled
+            try:
+                await asyncio.sleep(1)
+            except asyncio.CancelledError:
+                upstream_cancelled = True
+                raise
+
+        caller = asyncio.create_task(flight.do('key', upstream))
+        await asyncio.sleep(0)
+        caller.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0)
+
+        return flight, upstream_cancelled
+
+    flight, upstream_cancelled = asyncio.run(main())
+
+    assert upstream_cancelled
+    assert len(flight) == 0
+
+
+def test_errors_are_shared():
+    async def upstream():
+        await asyncio.sleep(0.01)
+        raise ValueError
+
+    async def main():
+        flight = SingleFlight()
+        return await asyncio.gather(
+            flight.do('key', upstream),
+            flight.do('key', upstream),
+            return_exceptions=True
+        )
+
+    assert all(
+        isinstance(result, ValueError)
+        for result in asyncio.run(main())
+    )
+
+
+def test_view_deadline_doesnt_cancel_the_call():
+    from vocabulary.view import routes
+
+    flight = SingleFlight()
+    finished = []
+
+    async def upstream():
+        await asyncio.sleep(0.05)
+        finished.append(True)
+        return 'late'
+
+    async def main():
+        assert await routes._with_deadline(flight.do('key', upstream), 0.01, 'test') is None
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert finished == [True]
+    assert not routes._late_fetches
+
+
+def test_view_fragment_changes_with_data():
+    from vocabulary.examples.records import CorpusExample
+    from vocabulary.view import routes
+
+    example = CorpusExample('I got it', 'Я понял', 'src', True, 'https://example.com', ('got', ))
+    first = routes._render_sections(word='get', corpus_examples=[example], linked_words=['obtain'])
+
+    example.native = 'Я получил'
+    second = routes._render_sections(word='get', corpus_examples=[example], linked_words=None)
+
+    assert 'Я получил' in second['corpus_examples_html']
+    assert 'unavailable' in second['linked_words_html']
+    assert first['linked_words_html'] != second['linked_words_html']
+    routes.fragments_cache.clear()
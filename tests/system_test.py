@@ -0,0 +1,90 @@
+import json
+
+import brotli
+from fastapi.testclient import TestClient
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse
+
+from vocabulary.common.conditional import ConditionalMiddleware, negotiate_encoding
+from vocabulary.main import app
+
+
+client = TestClient(app)
+
+
+def test_health():
+    resp = client.get('/health')
+
+    assert resp.status_code == 200
+    assert resp.json() == {'status': 'ok'}
+
+
+def test_readiness_reports_pool_stats():
+    resp = client.get('/ready')
+    json = resp.json()
+
+    assert resp.status_code == (200 if json['ready'] else 503)
+    assert json['database']['ok'] == json['ready']
+    assert set(json['pool']) == {'size', 'checked_in', 'checked_out', 'overflow'}
+    assert json['upstreams']['rnc']['state'] == 'closed'
+    assert json['upstreams']['rusvectores']['state'] == 'closed'
+
+
+def test_metrics_are_recorded():
+    client.get('/health')
+    resp = client.get('/metrics')
+
+    assert resp.status_code == 200
+    assert resp.headers['content-type'].startswith('text/plain')
+    assert 'http_requests_total{method="GET",route="/health",status="200"}' in resp.text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/health",le="+Inf"}' in resp.text
+    assert 'cache_hits_total{cache="linked_words"}' in resp.text
+
+
+def _json_client(payload) -> TestClient:
+    json_app = Starlette()
+    json_app.add_route('/', lambda request: JSONResponse(payload))
+    json_app.add_middleware(ConditionalMiddleware, minimum_size=100)
+    return TestClient(json_app)
+
+
+def test_etag_not_modified():
+    json_client = _json_client({'examples': ['example'] * 100})
+
+    resp = json_client.get('/', headers={'Accept-Encoding': 'gzip'})
+    etag = resp.headers['etag']
+
+    assert resp.status_code == 200
+    assert resp.headers['content-encoding'] == 'gzip'
+    assert resp.json() == {'examples': ['example'] * 100}
+
+    resp = json_client.get('/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+    assert resp.status_code == 304
+    assert resp.content == b''
+    assert resp.headers['etag'] == etag
+
+    # another encoding is another representation
+    resp = json_client.get('/', headers={'Accept-Encoding': 'identity', 'If-None-Match': etag})
+    assert resp.status_code == 200
+    assert 'content-encoding' not in resp.headers
+
+
+def test_small_response_not_compressed():
+    resp = _json_client({'ok': True}).get('/', headers={'Accept-Encoding': 'gzip'})
+
+    assert resp.status_code == 200
+    assert 'content-encoding' not in resp.headers
+    assert resp.headers['etag'].startswith('"')
+
+
+def test_brotli_is_preferred():
+    payload = {'examples': ['example'] * 100}
+    resp = _json_client(payload).get('/', headers={'Accept-Encoding': 'gzip, br'}, stream=True)
+
+    assert resp.status_code == 200
+    assert resp.headers['content-encoding'] == 'br'
+    assert json.loads(brotli.decompress(resp.raw.read(decode_content=False))) == payload
+
+    assert negotiate_encoding('gzip;q=1, br;q=0') == 'gzip'
+    assert negotiate_encoding('*') == 'br'
+    assert negotiate_encoding('identity') is None
@@ -0,0 +1,177 @@
+import asyncio
+import time
+
+import pytest
+
+from vocabulary.common import breaker, ratelimit
+from vocabulary.common.ratelimit import RateLimiter, RateLimitExceeded
+
+
+@pytest.fixture(autouse=True)
+def forget_test_upstreams():
+    limiters, breakers = dict(ratelimit.limiters), dict(breaker.breakers)
+    yield
+    for registry, saved in ((ratelimit.limiters, limiters), (breaker.breakers, breakers)):
+        registry.clear()
+        registry.update(saved)
+
+
+def test_burst_then_rate():
+    async def main():
+        limiter = RateLimiter('test-rate', rate=50, burst=2, concurrency=10, max_wait=1)
+        start = time.monotonic()
+        for _ in range(4):
+            async with limiter:
+                pass
+        return time.monotonic() - start
+
+    # 2 requests at once, 2 more at 50 rps
+    assert 0.03 <= asyncio.run(main()) < 0.5
+
+
+def test_concurrency_cap():
+    in_flight = max_in_flight = 0
+
+    async def request(limiter):
+        nonlocal in_flight, max_in_flight
+        async with limiter:
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+    async def main():
+        limiter = RateLimiter('test-concurrency', rate=1000, burst=100, concurrency=2, max_wait=1)
+        await asyncio.gather(*(request(limiter) for _ in range(6)))
+
+    asyncio.run(main())
+    assert max_in_flight == 2
+
+
+def test_bounded_wait():
+    async def main():
+        limiter = RateLimiter('test-wait', rate=1, burst=1, concurrency=10, max_wait=0.05)
+        async with limiter:
+            pass
+
+        with pytest.raises(RateLimitExceeded):
+            async with limiter:
+                pass
+        return limiter
+
+    limiter = asyncio.run(main())
+    assert limiter.waiting == 0
+
+
+def test_costly_request_waits_for_its_tokens():
+    async def main():
+        limiter = RateLimiter('test-cost', rate=100, burst=2, concurrency=10, max_wait=1)
+        await limiter.acquire(cost=2)
+        limiter.release()
+
+        start = time.monotonic()
+        await limiter.acquire(cost=2)
+        limiter.release()
+        waited = time.monotonic() - start
+
+        with pytest.raises(ValueError):
+            await limiter.acquire(cost=3)
+        return waited, limiter
+
+    waited, limiter = asyncio.run(main())
+    # 2 tokens at 100 rps
+    assert 0.015 <= waited < 0.5
+    # the rejected request doesn't take a slot
+    assert limiter._semaphore._value == limiter.concurrency
+
+
+def test_limiter_is_used_from_several_loops():
+    limiter = RateLimiter('test-loops', rate=1000, burst=100, concurrency=1, max_wait=1)
+
+    async def request():
+        async with limiter:
+            await asyncio.sleep(0.01)
+
+    async def main():
+        await asyncio.gather(*(request() for _ in range(3)))
+
+    asyncio.run(main())
+    asyncio.run(main())
+    assert limiter.waiting == 0
+
+
+def _guarded(circuit, fail):
+    @circuit.guard
+    async def request():
+        if fail:
+            raise ConnectionError
+        return 'ok'
+    return request
+
+
+def test_circuit_opens_after_failures():
+    circuit = breaker.CircuitBreaker('test-open', failure_threshold=2, reset_timeout=60)
+    fail = _guarded(circuit, fail=True)
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            asyncio.run(fail())
+
+    assert circuit.state == breaker.OPEN
+    with pytest.raises(breaker.CircuitOpen):
+        asyncio.run(fail())
+    assert circuit.stats()['failures'] == 2
+
+
+def test_circuit_half_open_trial():
+    circuit = breaker.CircuitBreaker('test-trial', failure_threshold=1, reset_timeout=0.01)
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(_guarded(circuit, fail=True)())
+    assert circuit.state == breaker.OPEN
+
+    time.sleep(0.02)
+    assert circuit.state == breaker.HALF_OPEN
+    # the failed trial opens the circuit again
+    with pytest.raises(ConnectionError):
+        asyncio.run(_guarded(circuit, fail=True)())
+    assert circuit.state == breaker.OPEN
+
+    time.sleep(0.02)
+    assert asyncio.run(_guarded(circuit, fail=False)()) == 'ok'
+    assert circuit.state == breaker.CLOSED
+
+
+def test_circuit_ignores_local_errors():
+    circuit = breaker.CircuitBreaker(
+        'test-ignore', failure_threshold=1, reset_timeout=60, ignore=(RateLimitExceeded, ))
+
+    @circuit.guard
+    async def request():
+        raise RateLimitExceeded
+
+    with pytest.raises(RateLimitExceeded):
+        asyncio.run(request())
+    assert circuit.state == breaker.CLOSED
+
+
+@pytest.mark.parametrize('error', ('NoResultFound', 'LastPageDoesntExist'))
+def test_rnc_circuit_ignores_no_data(error, monkeypatch):
+    from vocabulary.examples import db
+
+    exc = getattr(db._rnc().corpora_requests, error)
+
+    class Corpus:
+        async def request_examples_async(self):
+            raise exc
+
+    monkeypatch.setattr(db, '_create_corpus', lambda **kwargs: Corpus())
+
+    async def main():
+        for _ in range(db.rnc_breaker.failure_threshold):
+            with pytest.raises(exc):
+                await db._request_corpus_examples(mycorp='en', word='qwzx', pages_count=1)
+
+    asyncio.run(main())
+    assert db.rnc_breaker.state == breaker.CLOSED
+    assert db.rnc_breaker.stats()['failures'] == 0
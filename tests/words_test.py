@@ -0,0 +1,284 @@
+import asyncio
+import contextlib
+import datetime
+import zipfile
+from xml.etree import ElementTree
+
+import pytest
+
+from vocabulary.words import db, export, lemmas, prefetch, repetition, schemas
+from vocabulary.words.search import PrefixIndex
+
+
+def test_prefix_search_is_case_insensitive():
+    index = PrefixIndex()
+    index.update(['get', 'Getting', 'got', 'forget', 'gets'])
+
+    assert index.search('GET') == ['get', 'gets', 'Getting']
+    assert index.search('get', limit=1) == ['get']
+    assert index.search('x') == []
+
+
+def test_word_from_several_tables_stays_until_last_discard():
+    index = PrefixIndex()
+    index.add('get')
+    index.add('get')
+
+    index.discard('get')
+    assert index.search('g') == ['get']
+
+    index.discard('get')
+    index.discard('unknown')
+    assert index.search('g') == []
+    assert len(index) == 0
+
+
+@pytest.mark.parametrize('buffer_size', (1, 2, 1024))
+def test_prefix_index_buffer_is_merged(buffer_size):
+    index = PrefixIndex(buffer_size=buffer_size)
+    index.update(['get', 'gets', 'go', 'got'])
+    index.discard('gets')
+    index.discard('got')
+    index.add('got')
+    index.add('Gap')
+
+    assert index.search('g') == ['Gap', 'get', 'go', 'got']
+    assert index.search('go', limit=1) == ['go']
+    assert len(index) == 4
+
+
+def test_prefix_index_is_rebuilt():
+    index = PrefixIndex()
+    index.update(['get', 'stale'])
+    index.rebuild(['got', 'get', 'got'])
+
+    assert index.search('') == ['get', 'got']
+    assert index.search('s') == []
+
+    index.discard('got')
+    assert index.search('g') == ['get', 'got']
+
+
+def test_repetition_intervals_grow():
+    state = {'ease': 2.5, 'interval_days': 0, 'repetitions': 0}
+    intervals = []
+    for _ in range(4):
+        state = repetition.schedule(**state, quality=5)
+        state.pop('due_at')
+        intervals += [state['interval_days']]
+
+    assert intervals[:2] == [1, 6]
+    assert intervals[2] > intervals[1]
+    assert intervals[3] > intervals[2]
+    assert state['ease'] > 2.5
+
+
+def test_forgotten_word_is_repeated_from_start():
+    state = repetition.schedule(ease=2.5, interval_days=15, repetitions=3, quality=1)
+
+    assert state['repetitions'] == 0
+    assert state['interval_days'] == 1
+    assert state['ease'] == 2.5
+    assert state['due_at'] is not None
+
+
+def test_word_with_long_interval_is_learned():
+    state = repetition.schedule(ease=2.5, interval_days=10_000, repetitions=10, quality=5)
+
+    assert state['due_at'] is None
+
+
+def test_empty_linked_words_are_stored(monkeypatch):
+    stored = {}
+
+    async def get_stored(word, **kwargs):
+        return None
+
+    async def request(word):
+        return []
+
+    async def store(word, synonyms):
+        stored[word] = synonyms
+
+    monkeypatch.setattr(db, '_get_stored_linked_words', get_stored)
+    monkeypatch.setattr(db, '_request_linked_words', request)
+    monkeypatch.setattr(db, '_store_linked_words', store)
+
+    assert asyncio.run(db.get_linked_words(' Qwzxv ')) == []
+    assert stored == {'qwzxv': []}
+    db.linked_words_cache.pop('qwzxv')
+
+
+def test_forms_share_the_lemma(monkeypatch):
+    monkeypatch.setattr(lemmas, '_lemmas', {})
+    monkeypatch.setattr(lemmas, '_own_lemmas', {})
+
+    forms = lemmas._new_forms('get', ['Got', 'getting', 'get', 'получил', ''], 'en')
+    assert forms == {'got': 'get', 'getting': 'get'}
+
+    lemmas._remember('en', forms)
+    assert lemmas.lemmatize('got', 'en') == 'get'
+    # the map is per language
+    assert lemmas.lemmatize('got', 'de') == 'got'
+    assert lemmas.lemmatize('got', lemmas.language('получил', 'en')) == 'got'
+
+
+def test_own_lemma_isnt_merged(monkeypatch):
+    monkeypatch.setattr(lemmas, '_lemmas', {})
+    monkeypatch.setattr(lemmas, '_own_lemmas', {})
+    monkeypatch.setattr(lemmas.database, 'session', None)
+
+    # 'saw' is requested by itself, it has no new forms to store
+    asyncio.run(lemmas.add_forms('saw', ['saw'], 'en'))
+
+    assert lemmas._new_forms('see', ['saw', 'seen'], 'en') == {'seen': 'see'}
+
+
+def _fake_words():
+    async def iter_words(*, source, batch_size=2):
+        words = [
+            {'word': word, 'added_at': datetime.datetime(2022, 5, 1, 12, 0)}
+            for word in ('get', 'go <away>', 'take')
+        ]
+        for start in range(0, len(words), batch_size):
+            yield words[start:start + batch_size]
+    return iter_words
+
+
+async def _read(chunks) -> bytes:
+    return b''.join([chunk async for chunk in chunks])
+
+
+def test_export_csv(monkeypatch):
+    monkeypatch.setattr(export.db, 'iter_words', _fake_words())
+    content = asyncio.run(_read(export.csv_chunks('to-learn'))).decode('utf-8-sig')
+
+    assert content.splitlines() == [
+        'word,added_at', 'get,2022-05-01 12:00:00', 'go <away>,2022-05-01 12:00:00', 'take,2022-05-01 12:00:00'
+    ]
+
+
+def test_export_docx(monkeypatch):
+    monkeypatch.setattr(export.db, 'iter_words', _fake_words())
+    path = asyncio.run(export.export_file(format='docx', source='to-learn'))
+    try:
+        with zipfile.ZipFile(path) as archive:
+            document = ElementTree.fromstring(archive.read('word/document.xml'))
+            assert '[Content_Types].xml' in archive.namelist()
+    finally:
+        export.remove_file(path)
+
+    texts = [
+        ''.join(node.text for node in paragraph.iter(f"{{{export.WORDPROCESSINGML}}}t"))
+        for paragraph in document.iter(f"{{{export.WORDPROCESSINGML}}}p")
+    ]
+    assert texts == ['Vocabulary', '1. Get', '2. Go <away>', '3. Take']
+
+
+def test_export_xlsx(monkeypatch):
+    monkeypatch.setattr(export.db, 'iter_words', _fake_words())
+    path = asyncio.run(export.export_file(format='xlsx', source='to-learn'))
+    try:
+        with zipfile.ZipFile(path) as archive:
+            strings = archive.read('xl/worksheets/sheet1.xml').decode('utf-8')
+    finally:
+        export.remove_file(path)
+
+    assert all(word in strings for word in ('get', 'go &lt;away&gt;', 'take'))
+
+
+@pytest.mark.parametrize('added_at', (datetime.datetime(2022, 5, 1, 12, 0), None))
+def test_cursor_roundtrip(added_at):
+    word_id = '6e0e1bd9-8ab6-4c33-9d1e-ed2bcb48b4a1'
+    cursor = db.encode_cursor({'added_at': added_at, 'word_id': word_id})
+
+    assert db.decode_cursor(cursor) == (added_at, word_id)
+    with pytest.raises(ValueError):
+        db.decode_cursor('not a cursor')
+
+
+def test_words_without_added_at_follow_the_others(monkeypatch):
+    pages = [[{'word': 'get'}], [{'word': 'go'}, {'word': 'take'}]]
+    stmts = []
+
+    class Session:
+        async def execute(self, stmt):
+            stmts.append(stmt)
+            rows = pages[len(stmts) - 1]
+
+            class Result:
+                def mappings(self):
+                    return self
+
+                def all(self):
+                    return rows
+            return Result()
+
+    @contextlib.asynccontextmanager
+    async def session():
+        yield Session()
+
+    monkeypatch.setattr(db.database, 'session', session)
+    after = (datetime.datetime(2022, 5, 1, 12, 0), '6e0e1bd9-8ab6-4c33-9d1e-ed2bcb48b4a1')
+    words = asyncio.run(db.get_words_to_learn(limit=3, after=after))
+
+    assert [word['word'] for word in words] == ['get', 'go', 'take']
+    assert [stmt._limit for stmt in stmts] == [3, 2]
+    # the row comparison is the only predicate of the first query
+    assert ' OR ' not in str(stmts[0].whereclause)
+    assert 'IS NULL' in str(stmts[1].whereclause)
+
+
+def test_word_without_added_at_is_listed():
+    word = schemas.WordToLearnResponse(word='get', word_id='6e0e1bd9-8ab6-4c33-9d1e-ed2bcb48b4a1', added_at=None)
+
+    assert word.added_at is None
+
+
+def test_not_fetched_words_are_rescanned_once_the_queue_is_drained(monkeypatch):
+    scans = []
+
+    async def get_not_fetched_words():
+        scans.append(len(scans))
+        return [f"word-{len(scans)}"]
+
+    class Connection:
+        async def scalar(self, stmt):
+            return 1
+
+    monkeypatch.setattr(prefetch, '_get_not_fetched_words', get_not_fetched_words)
+    monkeypatch.setattr(prefetch.settings, 'PREFETCH_SCAN_INTERVAL', 0.01)
+
+    async def main():
+        queue = asyncio.Queue()
+        monkeypatch.setattr(prefetch, '_queue', queue)
+        scan = asyncio.create_task(prefetch._scan(queue, Connection()))
+
+        await asyncio.sleep(0.05)
+        # the first words aren't prefetched yet
+        assert len(scans) == 1
+        queue.get_nowait()
+        await asyncio.sleep(0.05)
+
+        scan.cancel()
+        return queue.get_nowait()
+
+    assert asyncio.run(main()) == 'word-2'
+
+
+def test_changes_made_while_loading_are_replayed():
+    index = PrefixIndex()
+    index.update(['get', 'take'])
+
+    index.start_journal()
+    # made after the snapshot of the database was taken
+    index.add('go')
+    index.discard('take')
+    index.rebuild(['get', 'take'])
+
+    assert index.search('') == ['get', 'go']
+
+    # not recorded after the rebuild
+    index.add('put')
+    index.rebuild(['get'])
+    assert index.search('') == ['get']
@@ -0,0 +1,130 @@
+""" Circuit breakers of the upstreams: closed -> open -> half-open -> closed """
+import time
+from functools import wraps
+from typing import Any, Callable, Optional
+
+from vocabulary.common import metrics
+from vocabulary.common.log import logger
+
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self,
+                 name: str,
+                 *,
+                 failure_threshold: int,
+                 reset_timeout: float,
+                 half_open_calls: int = 1,
+                 ignore: tuple[type[BaseException], ...] = ()) -> None:
+        """
+        :param failure_threshold: int, consecutive failures to open the circuit.
+        :param reset_timeout: float, seconds the circuit is open before a trial.
+        :param half_open_calls: int, trial calls allowed at once.
+        :param ignore: exceptions which aren't failures of the upstream.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.ignore = ignore
+
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probes = 0
+
+        breakers[name] = self
+
+    @property
+    def state(self) -> str:
+        opened_at = self._opened_at
+        if self._state == OPEN and opened_at is not None and time.monotonic() - opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probes = 0
+            logger.info("Circuit '%s' is half-open", self.name)
+        return self._state
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == OPEN
+
+    def _before_call(self) -> None:
+        state = self.state
+        if state == OPEN:
+            raise CircuitOpen(f"{self.name}: circuit is open")
+        if state == HALF_OPEN:
+            if self._probes >= self.half_open_calls:
+                raise CircuitOpen(f"{self.name}: circuit is half-open, trial is running")
+            self._probes += 1
+
+    def _on_success(self) -> None:
+        if self._state != CLOSED:
+            logger.info("Circuit '%s' is closed", self.name)
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = None
+
+    def _on_failure(self) -> None:
+        self._failures += 1
+        if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != OPEN:
+                logger.warning("Circuit '%s' is open after %s failures", self.name, self._failures)
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+
+    def _on_ignored(self) -> None:
+        # free the trial slot, the upstream wasn't checked
+        if self._state == HALF_OPEN:
+            self._probes = max(self._probes - 1, 0)
+
+    def guard(self,
+              func: Callable) -> Callable:
+        """ Decorator for coroutine functions.
+
+        :exception CircuitOpen: if the circuit is open.
+        """
+        @wraps(func)
+        async def wrapped(*args, **kwargs):
+            self._before_call()
+            try:
+                result = await func(*args, **kwargs)
+            except self.ignore:
+                self._on_ignored()
+                raise
+            except Exception:
+                self._on_failure()
+                raise
+            except BaseException:
+                self._on_ignored()
+                raise
+
+            self._on_success()
+            return result
+        return wrapped
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            'state': self.state,
+            'failures': self._failures,
+            'opened_for': None if self._opened_at is None else time.monotonic() - self._opened_at
+        }
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(name={self.name!r}, state={self.state!r})"
+
+
+breakers: dict[str, CircuitBreaker] = {}
+
+metrics.Collector(
+    'circuit_breaker_state', 'State of the circuit: 0 closed, 1 half-open, 2 open', 'gauge',
+    lambda: (({'upstream': name}, _STATE_VALUES[breaker.state]) for name, breaker in breakers.items()))
@@ -0,0 +1,383 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Hashable, Iterator, Optional, Union
+
+from vocabulary.common import settings
+
+
+class LRUCache:
+    """ In-process LRU cache, items expire after ttl seconds """
+
+    def __init__(self,
+                 *,
+                 maxsize: int,
+                 ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self,
+            key: Hashable,
+            default: Any = None) -> Any:
+        try:
+            expires_at, value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self,
+            key: Hashable,
+            value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+
+        self._data[key] = time.monotonic() + self.ttl, value
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self,
+            key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            'size': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(maxsize={self.maxsize}, " \
+               f"ttl={self.ttl}, {self.stats})"
+
+
+def _check_private(fd: int,
+                   path: Path) -> None:
+    """
+    :exception PermissionError: if the file belongs to another
+     user or the others have access to it.
+    """
+    stat = os.fstat(fd)
+    if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+        raise PermissionError(f"{path} must belong to the user {os.getuid()} and have no access for the others")
+
+
+def _private_dir(path: Path) -> Path:
+    """ Create the directory only the user of the process has access to.
+
+    :exception PermissionError: if the existing one is accessible to others.
+    """
+    path.mkdir(mode=0o700, exist_ok=True)
+
+    fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW)
+    try:
+        _check_private(fd, path)
+    finally:
+        os.close(fd)
+    return path
+
+
+class SharedCache:
+    """ Cache shared by the processes of a node, it's backed
+    by a memory-mapped file. Items expire after ttl seconds.
+
+    The file is a set-associative table: a key is hashed to a set
+    of `ways` slots, the least recently used slot of the set is evicted.
+    Values are pickled and compressed, the ones bigger than
+    a slot aren't cached. Sets are locked with fcntl record locks.
+
+    The values are unpickled, so the file must belong to the user
+    of the process and mustn't be accessible to the others.
+    """
+    MAGIC = b'VOCC'
+    VERSION = 1
+    # magic, version, sets, ways, slot size
+    HEADER = struct.Struct('<4sIIII')
+    HEADER_SIZE = 64
+    # key digest, expires at, used at, value length
+    SLOT_HEADER = struct.Struct('<16sddI')
+    SLOT_HEADER_SIZE = 40
+    EMPTY_KEY = bytes(16)
+
+    def __init__(self,
+                 path: Union[str, Path],
+                 *,
+                 maxsize: int,
+                 ttl: float,
+                 slot_size: int,
+                 ways: int = 8) -> None:
+        """
+        :param maxsize: int, count of slots, it's rounded up to `ways`.
+        :param slot_size: int, bytes per slot, the value gets
+         slot_size - SLOT_HEADER_SIZE bytes after compressing.
+        """
+        self.path = Path(path)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.slot_size = slot_size
+        self.ways = ways
+        self.sets = max(-(-maxsize // ways), 1)
+
+        self._fd: Optional[int] = None
+        self._mmap: Optional[mmap.mmap] = None
+        self._pid: Optional[int] = None
+        # stats of this process
+        self.hits = self.misses = self.evictions = 0
+
+    @property
+    def _file_size(self) -> int:
+        return self.HEADER_SIZE + self.sets * self.ways * self.slot_size
+
+    @property
+    def _capacity(self) -> int:
+        return self.slot_size - self.SLOT_HEADER_SIZE
+
+    def _open(self) -> mmap.mmap:
+        # the mapping isn't inherited by the forked workers
+        if self._mmap is not None and self._pid == os.getpid():
+            return self._mmap
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+        try:
+            _check_private(fd, self.path)
+            self._init_file(fd)
+        except BaseException:
+            os.close(fd)
+            raise
+
+        self._fd, self._pid = fd, os.getpid()
+        self._mmap = mmap.mmap(fd, self._file_size)
+        return self._mmap
+
+    def _init_file(self,
+                   fd: int) -> None:
+        """ Write the header to the new file.
+
+        :exception ValueError: if the file has another layout,
+         it isn't truncated, the other processes might have mapped it.
+        """
+        expected = self.HEADER.pack(self.MAGIC, self.VERSION, self.sets, self.ways, self.slot_size)
+
+        fcntl.lockf(fd, fcntl.LOCK_EX, self.HEADER_SIZE, 0)
+        try:
+            header = os.pread(fd, self.HEADER.size, 0)
+            if header == expected and os.fstat(fd).st_size == self._file_size:
+                return
+            # the header is written after the size is set, so nobody has mapped the file without it
+            if header.strip(b'\0') or os.fstat(fd).st_size > self._file_size:
+                raise ValueError(f"{self.path} is a cache of another layout")
+
+            # the file is sparse
+            os.ftruncate(fd, self._file_size)
+            os.pwrite(fd, expected, 0)
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, self.HEADER_SIZE, 0)
+
+    @contextmanager
+    def _locked(self,
+                set_index: int,
+                exclusive: bool) -> Iterator[mmap.mmap]:
+        data = self._open()
+        fd = self._fd
+        assert fd is not None
+
+        length = self.ways * self.slot_size
+        start = self.HEADER_SIZE + set_index * length
+
+        fcntl.lockf(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH, length, start)
+        try:
+            yield data
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, length, start)
+
+    @staticmethod
+    def _digest(key: Hashable) -> bytes:
+        # repr is the same in every process for str and tuples of them
+        return hashlib.blake2b(repr(key).encode(), digest_size=16).digest()
+
+    def _slots(self,
+               set_index: int) -> range:
+        start = self.HEADER_SIZE + set_index * self.ways * self.slot_size
+        return range(start, start + self.ways * self.slot_size, self.slot_size)
+
+    def _find(self,
+              data: mmap.mmap,
+              set_index: int,
+              digest: bytes) -> Optional[int]:
+        for offset in self._slots(set_index):
+            if data[offset:offset + 16] == digest:
+                return offset
+        return None
+
+    def _set_index(self,
+                   digest: bytes) -> int:
+        return int.from_bytes(digest[:8], 'little') % self.sets
+
+    def get(self,
+            key: Hashable,
+            default: Any = None) -> Any:
+        if self.maxsize <= 0:
+            self.misses += 1
+            return default
+
+        digest = self._digest(key)
+        set_index = self._set_index(digest)
+        now = time.time()
+
+        with self._locked(set_index, exclusive=False) as data:
+            if (offset := self._find(data, set_index, digest)) is None:
+                value = None
+            else:
+                _, expires_at, _, length = self.SLOT_HEADER.unpack_from(data, offset)
+                value = None
+                if expires_at >= now:
+                    start = offset + self.SLOT_HEADER_SIZE
+                    value = data[start:start + length]
+                    # racy under the shared lock, it's only a hint for eviction
+                    struct.pack_into('<d', data, offset + 24, now)
+
+        if value is None:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        return pickle.loads(zlib.decompress(value))
+
+    def set(self,
+            key: Hashable,
+            value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+
+        digest = self._digest(key)
+        packed = zlib.compress(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), 1)
+        if len(packed) > self._capacity:
+            # an old value mustn't outlive the new one
+            self.pop(key)
+            return
+
+        set_index = self._set_index(digest)
+        now = time.time()
+
+        with self._locked(set_index, exclusive=True) as data:
+            offset = self._find(data, set_index, digest)
+            if offset is None:
+                offset = self._victim(data, set_index, now)
+
+            self.SLOT_HEADER.pack_into(data, offset, digest, now + self.ttl, now, len(packed))
+            start = offset + self.SLOT_HEADER_SIZE
+            data[start:start + len(packed)] = packed
+
+    def _victim(self,
+                data: mmap.mmap,
+                set_index: int,
+                now: float) -> int:
+        """ An empty or expired slot, the least recently used one otherwise """
+        slots = self._slots(set_index)
+        victim, victim_used_at = slots[0], float('inf')
+        for offset in slots:
+            key, expires_at, used_at, _ = self.SLOT_HEADER.unpack_from(data, offset)
+            if key == self.EMPTY_KEY or expires_at < now:
+                return offset
+            if used_at < victim_used_at:
+                victim, victim_used_at = offset, used_at
+
+        self.evictions += 1
+        return victim
+
+    def pop(self,
+            key: Hashable) -> None:
+        if self.maxsize <= 0:
+            return
+
+        digest = self._digest(key)
+        set_index = self._set_index(digest)
+
+        with self._locked(set_index, exclusive=True) as data:
+            if (offset := self._find(data, set_index, digest)) is not None:
+                self.SLOT_HEADER.pack_into(data, offset, self.EMPTY_KEY, 0, 0, 0)
+
+    def clear(self) -> None:
+        if self.maxsize <= 0:
+            return
+
+        for set_index in range(self.sets):
+            with self._locked(set_index, exclusive=True) as data:
+                for offset in self._slots(set_index):
+                    self.SLOT_HEADER.pack_into(data, offset, self.EMPTY_KEY, 0, 0, 0)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            'size': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+    def __len__(self) -> int:
+        """ Count of not expired items of all the processes """
+        if self.maxsize <= 0:
+            return 0
+
+        data = self._open()
+        now = time.time()
+        return sum(
+            1
+            for set_index in range(self.sets)
+            for offset in self._slots(set_index)
+            if (header := self.SLOT_HEADER.unpack_from(data, offset))[0] != self.EMPTY_KEY and header[1] >= now
+        )
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(path={str(self.path)!r}, maxsize={self.maxsize}, " \
+               f"ttl={self.ttl}, {self.stats})"
+
+
+def create_cache(name: str,
+                 *,
+                 maxsize: int,
+                 ttl: float,
+                 slot_size: int) -> Union[LRUCache, SharedCache]:
+    """ Cache of the backend chosen by CACHE_BACKEND.
+
+    :param slot_size: int, bytes per item of the shared cache.
+    """
+    if settings.CACHE_BACKEND == 'shared':
+        # a file per layout, the workers of the previous
+        # deploy might still map the file of another one
+        file_name = f"{name}.v{SharedCache.VERSION}.{maxsize}x{slot_size}.cache"
+        path = _private_dir(Path(settings.CACHE_SHARED_DIR) / f"vocabulary-{os.getuid()}") / file_name
+        return SharedCache(path, maxsize=maxsize, ttl=ttl, slot_size=slot_size)
+    return LRUCache(maxsize=maxsize, ttl=ttl)
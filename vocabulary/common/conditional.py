@@ -0,0 +1,157 @@
+""" Conditional GET and compression of JSON responses """
+import gzip
+import hashlib
+from typing import Optional
+
+import brotli
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+JSON_MEDIA_TYPE = 'application/json'
+
+
+def _accepted_encodings(accept_encoding: str) -> dict[str, float]:
+    encodings = {}
+    for item in accept_encoding.split(','):
+        name, *params = item.strip().split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name:
+            encodings[name.lower()] = quality
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """ Brotli if it's accepted, else gzip if it's accepted """
+    encodings = _accepted_encodings(accept_encoding)
+    wildcard = encodings.get('*', 0)
+
+    for name in ('br', 'gzip'):
+        if encodings.get(name, wildcard) > 0:
+            return name
+    return None
+
+
+def compress(body: bytes,
+             encoding: str,
+             level: int) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=level)
+    # mtime=0 to get the same bytes for the same body
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+def make_etag(body: bytes,
+              encoding: Optional[str]) -> str:
+    """ Strong ETag, every encoding is a representation of its own """
+    digest = hashlib.blake2b(body, digest_size=16)
+    digest.update((encoding or 'identity').encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(if_none_match: str,
+                 etag: str) -> bool:
+    if if_none_match.strip() == '*':
+        return True
+    # weak comparison is used for If-None-Match
+    return any(
+        tag.strip().removeprefix('W/') == etag
+        for tag in if_none_match.split(',')
+    )
+
+
+class ConditionalMiddleware:
+    """ JSON responses get a strong ETag and are compressed
+    if they are bigger than minimum_size. GET with a matching
+    If-None-Match gets 304 without the body.
+
+    Other responses (HTML, NDJSON streams) are passed as is.
+    """
+
+    def __init__(self,
+                 app: ASGIApp,
+                 *,
+                 minimum_size: int,
+                 gzip_level: int = 6,
+                 brotli_level: int = 5) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = {'gzip': gzip_level, 'br': brotli_level}
+
+    async def __call__(self,
+                       scope: Scope,
+                       receive: Receive,
+                       send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        start: Optional[Message] = None
+        chunks: list[bytes] = []
+        passthrough = False
+
+        async def _send(message: Message) -> None:
+            nonlocal start, passthrough
+
+            if passthrough or message['type'] not in ('http.response.start', 'http.response.body'):
+                await send(message)
+                return
+
+            if message['type'] == 'http.response.start':
+                headers = Headers(raw=message['headers'])
+                if not headers.get('content-type', '').startswith(JSON_MEDIA_TYPE) or 'content-encoding' in headers:
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message
+                return
+
+            chunks.append(message.get('body', b''))
+            if message.get('more_body', False):
+                return
+
+            # the start is always sent before the body
+            assert start is not None
+            await self._send_buffered(scope['method'], request_headers, start, b''.join(chunks), send)
+
+        await self.app(scope, receive, _send)
+
+    async def _send_buffered(self,
+                             method: str,
+                             request_headers: Headers,
+                             start: Message,
+                             body: bytes,
+                             send: Send) -> None:
+        headers = MutableHeaders(raw=list(start['headers']))
+
+        encoding = None
+        if len(body) >= self.minimum_size:
+            encoding = negotiate_encoding(request_headers.get('accept-encoding', ''))
+            headers.add_vary_header('Accept-Encoding')
+
+        if start['status'] == 200 and method in ('GET', 'HEAD'):
+            etag = make_etag(body, encoding)
+            headers['ETag'] = etag
+
+            if etag_matches(request_headers.get('if-none-match', ''), etag):
+                del headers['Content-Length']
+                del headers['Content-Type']
+                await send({'type': 'http.response.start', 'status': 304, 'headers': headers.raw})
+                await send({'type': 'http.response.body', 'body': b''})
+                return
+
+        if encoding is not None:
+            body = compress(body, encoding, self.levels[encoding])
+            headers['Content-Encoding'] = encoding
+            headers['Content-Length'] = str(len(body))
+
+        await send({**start, 'headers': headers.raw})
+        await send({'type': 'http.response.body', 'body': body})
@@ -1,9 +1,13 @@
+import asyncio
+import datetime
+import time
 from contextlib import asynccontextmanager
-from typing import AsyncIterator
+from typing import Any, AsyncIterator, Optional
 
+import sqlalchemy.sql as sa
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 
-from vocabulary.common import settings
+from vocabulary.common import metrics, settings
 from vocabulary.common.log import logger
 
 
@@ -24,19 +28,88 @@ def get_dsn(driver: str = 'asyncpg') -> str:
 
 engine = create_async_engine(
     get_dsn(),
-    isolation_level=settings.DB_ISOLATION_LEVEL
+    isolation_level=settings.DB_ISOLATION_LEVEL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_POOL_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING
 )
 
+# result of the last background ping
+last_ping: dict[str, Any] = {
+    'ok': False,
+    'checked_at': None,
+    # seconds to get a connection from the pool
+    'wait_time': None,
+    'latency': None,
+    'error': 'Not pinged yet'
+}
+_ping_task: Optional[asyncio.Task] = None
+
 
 @asynccontextmanager
 async def session(**kwargs) -> AsyncIterator[AsyncSession]:
     new_ses = AsyncSession(bind=engine, expire_on_commit=False, **kwargs)
+    with metrics.DB_SESSION_LATENCY.time():
+        try:
+            yield new_ses
+            await new_ses.commit()
+        except Exception as e:
+            await new_ses.rollback()
+            logger.exception(e)
+            raise DatabaseError(e) from e
+        finally:
+            await new_ses.close()
+
+
+async def ping() -> None:
+    start = time.perf_counter()
     try:
-        yield new_ses
-        await new_ses.commit()
+        async with engine.connect() as conn:
+            acquired = time.perf_counter()
+            await conn.execute(sa.text('SELECT 1'))
     except Exception as e:
-        await new_ses.rollback()
-        logger.exception(e)
-        raise DatabaseError(e) from e
-    finally:
-        await new_ses.close()
+        logger.error("Database ping failed: %s", repr(e))
+        last_ping.update(ok=False, wait_time=None, latency=None, error=repr(e))
+    else:
+        last_ping.update(
+            ok=True,
+            wait_time=acquired - start,
+            latency=time.perf_counter() - acquired,
+            error=None
+        )
+    last_ping['checked_at'] = datetime.datetime.utcnow()
+
+
+def pool_stats() -> dict[str, int]:
+    pool = engine.pool
+    return {
+        'size': pool.size(),
+        'checked_in': pool.checkedin(),
+        'checked_out': pool.checkedout(),
+        # it's negative until the pool is full
+        'overflow': max(pool.overflow(), 0)
+    }
+
+
+async def _ping_forever() -> None:
+    while True:
+        await ping()
+        await asyncio.sleep(settings.DB_PING_INTERVAL)
+
+
+async def startup() -> None:
+    global _ping_task
+
+    if _ping_task is None:
+        _ping_task = asyncio.create_task(_ping_forever())
+
+
+async def shutdown() -> None:
+    global _ping_task
+
+    if _ping_task is not None:
+        _ping_task.cancel()
+        _ping_task = None
+    await engine.dispose()
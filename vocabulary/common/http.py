@@ -0,0 +1,68 @@
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+from vocabulary.common import settings
+from vocabulary.common.log import logger
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+_session: Optional['aiohttp.ClientSession'] = None
+_started = False
+
+
+def _create_session() -> 'aiohttp.ClientSession':
+    # aiohttp is imported on the first request to an upstream
+    import aiohttp
+
+    connector = aiohttp.TCPConnector(
+        limit=settings.HTTP_LIMIT,
+        limit_per_host=settings.HTTP_LIMIT_PER_HOST,
+        use_dns_cache=True,
+        ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL,
+        keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT
+    )
+    timeout = aiohttp.ClientTimeout(
+        sock_connect=settings.HTTP_CONNECT_TIMEOUT,
+        sock_read=settings.HTTP_READ_TIMEOUT
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+def _get_session() -> 'aiohttp.ClientSession':
+    global _session
+
+    if _session is None or _session.closed:
+        _session = _create_session()
+        logger.info("HTTP client pool started")
+    return _session
+
+
+async def startup() -> None:
+    """ The pool is created on the first request """
+    global _started
+    _started = True
+
+
+async def shutdown() -> None:
+    global _session, _started
+    _started = False
+
+    if _session is not None:
+        await _session.close()
+        _session = None
+        logger.info("HTTP client pool closed")
+
+
+@asynccontextmanager
+async def client() -> AsyncIterator['aiohttp.ClientSession']:
+    """ Get the app-wide session. If the pool
+    isn't started (scripts, tests) a one-off session is used.
+    """
+    if _started:
+        yield _get_session()
+        return
+
+    async with _create_session() as ses:
+        yield ses
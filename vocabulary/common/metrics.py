@@ -0,0 +1,272 @@
+""" Prometheus text format metrics without third party clients """
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from starlette.routing import Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30)
+
+_registry: list['Metric'] = []
+# name -> object with hits, misses, evictions and __len__
+_caches: dict[str, Any] = {}
+# name -> object with coalesced and __len__
+_flights: dict[str, Any] = {}
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: dict[str, Any]) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(
+        f'{name}="{_escape(value)}"'
+        for name, value in labels.items()
+    )
+    return f"{{{pairs}}}"
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], Any] = {}
+
+        _registry.append(self)
+
+    def _key(self,
+             labels: dict[str, Any]) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Expected labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self,
+                key: tuple[str, ...],
+                **extra) -> str:
+        return _format_labels(dict(zip(self.labelnames, key), **extra))
+
+    def samples(self) -> Iterator[str]:
+        for key, value in self._values.items():
+            yield f"{self.name}{self._labels(key)} {value}"
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.type}"
+        yield from self.samples()
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self,
+            amount: float = 1,
+            **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def set(self,
+            value: float,
+            **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self,
+            amount: float = 1,
+            **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self,
+            amount: float = 1,
+            **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+
+    def observe(self,
+                value: float,
+                **labels) -> None:
+        key = self._key(labels)
+        if (state := self._values.get(key)) is None:
+            # [bucket counts..., +Inf count, sum]
+            state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.]
+
+        state[bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    @contextmanager
+    def time(self,
+             **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> Iterator[str]:
+        for key, state in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                yield f"{self.name}_bucket{self._labels(key, le=bound)} {cumulative}"
+
+            count = cumulative + state[-2]
+            yield f"{self.name}_bucket{self._labels(key, le='+Inf')} {count}"
+            yield f"{self.name}_sum{self._labels(key)} {state[-1]}"
+            yield f"{self.name}_count{self._labels(key)} {count}"
+
+
+class Collector(Metric):
+    """ Metric, which values are got on rendering """
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 type: str,
+                 func: Callable[[], Iterable[tuple[dict[str, Any], float]]]) -> None:
+        super().__init__(name, documentation)
+        self.type = type
+        self.func = func
+
+    def samples(self) -> Iterator[str]:
+        for labels, value in self.func():
+            yield f"{self.name}{_format_labels(labels)} {value}"
+
+
+def timed(histogram: Histogram,
+          **labels) -> Callable:
+    """ Observe duration of the coroutine function """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        async def wrapped(*args, **kwargs):
+            with histogram.time(**labels):
+                return await func(*args, **kwargs)
+        return wrapped
+    return decorator
+
+
+def _route_path(scope: Scope) -> str:
+    """ Path template of the matched route to keep labels bounded """
+    for route in scope['app'].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return 'unmatched'
+
+
+class MetricsMiddleware:
+    """ Record latency, status and in-flight count of HTTP requests.
+
+    It's a plain ASGI middleware to measure streaming
+    responses till the end and to pass extension messages through.
+    """
+
+    def __init__(self,
+                 app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self,
+                       scope: Scope,
+                       receive: Receive,
+                       send: Send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def _send(message: Message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            route, method = _route_path(scope), scope['method']
+
+            HTTP_IN_FLIGHT.dec()
+            HTTP_LATENCY.observe(time.perf_counter() - start, method=method, route=route)
+            HTTP_REQUESTS.inc(method=method, route=route, status=status)
+
+
+def register_cache(name: str,
+                   cache: Any) -> None:
+    _caches[name] = cache
+
+
+def register_flight(name: str,
+                    flight: Any) -> None:
+    _flights[name] = flight
+
+
+def render() -> str:
+    return '\n'.join(
+        line
+        for metric in _registry
+        for line in metric.render()
+    ) + '\n'
+
+
+def _cache_samples(attr: Optional[str]) -> Callable[[], Iterator[tuple[dict[str, Any], float]]]:
+    def func() -> Iterator[tuple[dict[str, Any], float]]:
+        for name, cache in _caches.items():
+            yield {'cache': name}, len(cache) if attr is None else getattr(cache, attr)
+    return func
+
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total', 'Count of handled requests',
+    ('method', 'route', 'status'))
+HTTP_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time to the response end',
+    ('method', 'route'))
+HTTP_IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'Count of requests being handled')
+
+UPSTREAM_LATENCY = Histogram(
+    'upstream_request_duration_seconds', 'Duration of requests to RNC and rusvectores',
+    ('upstream', ))
+CORPUS_EXAMPLES_LATENCY = Histogram(
+    'corpus_examples_duration_seconds', 'Duration of getting corpus examples, cache included')
+DB_SESSION_LATENCY = Histogram(
+    'db_session_duration_seconds', 'Duration of database sessions')
+
+Collector('cache_size', 'Count of cached items', 'gauge', _cache_samples(None))
+Collector('cache_hits_total', 'Count of cache hits', 'counter', _cache_samples('hits'))
+Collector('cache_misses_total', 'Count of cache misses', 'counter', _cache_samples('misses'))
+Collector('cache_evictions_total', 'Count of evicted items', 'counter', _cache_samples('evictions'))
+Collector(
+    'coalesced_calls_total', 'Count of calls joined to the ones in flight', 'counter',
+    lambda: (({'call': name}, flight.coalesced) for name, flight in _flights.items()))
+Collector(
+    'calls_in_flight', 'Count of upstream calls in flight', 'gauge',
+    lambda: (({'call': name}, len(flight)) for name, flight in _flights.items()))
@@ -0,0 +1,131 @@
+""" Outbound rate limiting: token bucket plus concurrency cap per upstream """
+import asyncio
+import time
+from functools import wraps
+from typing import Callable, Optional
+
+from vocabulary.common import metrics
+
+
+class RateLimitExceeded(Exception):
+    pass
+
+
+class RateLimiter:
+    def __init__(self,
+                 name: str,
+                 *,
+                 rate: float,
+                 burst: int,
+                 concurrency: int,
+                 max_wait: float) -> None:
+        """
+        :param rate: float, requests per second.
+        :param burst: int, requests allowed at once after idling.
+        :param concurrency: int, requests allowed in flight.
+        :param max_wait: float, seconds a request might be queued.
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.concurrency = concurrency
+        self.max_wait = max_wait
+
+        self._tokens = float(burst)
+        self._updated_at = time.monotonic()
+        # the primitives are bound to a loop on 3.9, so they're
+        # created on the first acquire in the running one
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: asyncio.Semaphore
+        # FIFO for the token waiters
+        self._lock: asyncio.Lock
+        # count of the queued requests
+        self.waiting = 0
+
+        limiters[name] = self
+
+    def _bind_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def _take_token(self,
+                          deadline: float,
+                          cost: int) -> None:
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= cost:
+                    self._tokens -= cost
+                    return
+
+                delay = (cost - self._tokens) / self.rate
+                if time.monotonic() + delay > deadline:
+                    raise RateLimitExceeded(f"{self.name}: no token in {self.max_wait}s")
+                await asyncio.sleep(delay)
+
+    async def acquire(self,
+                      cost: int = 1) -> None:
+        """
+        :param cost: int, tokens the request takes, e.g. count of pages.
+        :exception ValueError: if the cost is more than the burst, the bucket never holds it.
+        :exception RateLimitExceeded: if the request waited longer than max_wait.
+        """
+        if not 1 <= cost <= self.burst:
+            raise ValueError(f"{self.name}: cost must be in [1; {self.burst}], but {cost} found")
+
+        start = time.monotonic()
+        deadline = start + self.max_wait
+        self._bind_loop()
+
+        self.waiting += 1
+        try:
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.max_wait)
+            except asyncio.TimeoutError:
+                raise RateLimitExceeded(f"{self.name}: no free slot in {self.max_wait}s") from None
+
+            try:
+                await self._take_token(deadline, cost)
+            except BaseException:
+                self._semaphore.release()
+                raise
+        finally:
+            self.waiting -= 1
+            UPSTREAM_QUEUE_WAIT.observe(time.monotonic() - start, upstream=self.name)
+
+    def release(self) -> None:
+        self._semaphore.release()
+
+    async def __aenter__(self) -> 'RateLimiter':
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self.release()
+
+    def limit(self,
+              func: Callable) -> Callable:
+        """ Decorator for coroutine functions """
+        @wraps(func)
+        async def wrapped(*args, **kwargs):
+            async with self:
+                return await func(*args, **kwargs)
+        return wrapped
+
+
+limiters: dict[str, RateLimiter] = {}
+
+UPSTREAM_QUEUE_WAIT = metrics.Histogram(
+    'upstream_queue_wait_seconds', 'Time requests wait for the rate limiter',
+    ('upstream', ))
+metrics.Collector(
+    'upstream_queue_depth', 'Count of requests waiting for the rate limiter', 'gauge',
+    lambda: (({'upstream': name}, limiter.waiting) for name, limiter in limiters.items()))
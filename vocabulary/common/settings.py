@@ -6,8 +6,10 @@ from environs import Env
 env = Env()
 env.read_env()
 
-SYNONYMS_SEARCH_URL = 'https://rusvectores.org/tayga_upos_skipgram_300_2_2019/' \
-                      '{word}/api/json/'
+# overridden to point at local stand-ins in benchmarks
+SYNONYMS_SEARCH_URL = env('SYNONYMS_SEARCH_URL',
+                          'https://rusvectores.org/tayga_upos_skipgram_300_2_2019/{word}/api/json/')
+RNC_URL = env('RNC_URL', 'https://processing.ruscorpora.ru/search.xml')
 CORPUS_EXAMPLES_MARKER = lambda ex: f"<b>{ex.upper()}</b>" # noqa
 
 with env.prefixed('API_'):
@@ -31,4 +33,88 @@ with env.prefixed('DB_'):
     DB_NAME = env('NAME')
     DB_ISOLATION_LEVEL = env('ISOLATION_LEVEL', 'REPEATABLE READ')
 
+    DB_POOL_SIZE = env.int('POOL_SIZE', 5)
+    DB_POOL_MAX_OVERFLOW = env.int('POOL_MAX_OVERFLOW', 10)
+    # seconds to wait for a connection
+    DB_POOL_TIMEOUT = env.float('POOL_TIMEOUT', 30)
+    # seconds, -1 to keep connections forever
+    DB_POOL_RECYCLE = env.int('POOL_RECYCLE', 30 * 60)
+    DB_POOL_PRE_PING = env.bool('POOL_PRE_PING', True)
+    # seconds between readiness pings
+    DB_PING_INTERVAL = env.float('PING_INTERVAL', 10)
+
+with env.prefixed('HTTP_'):
+    HTTP_LIMIT = env.int('LIMIT', 100)
+    HTTP_LIMIT_PER_HOST = env.int('LIMIT_PER_HOST', 10)
+    HTTP_DNS_CACHE_TTL = env.int('DNS_CACHE_TTL', 300)
+    HTTP_KEEPALIVE_TIMEOUT = env.float('KEEPALIVE_TIMEOUT', 30)
+    HTTP_CONNECT_TIMEOUT = env.float('CONNECT_TIMEOUT', 5)
+    HTTP_READ_TIMEOUT = env.float('READ_TIMEOUT', 15)
+
+with env.prefixed('RATE_LIMIT_'):
+    # requests per second, requests at once after idling, requests in flight;
+    # a scrape of RNC takes a token per page, so the pages count of a request is capped by the burst
+    RATE_LIMIT_RNC_RATE = env.float('RNC_RATE', 2)
+    RATE_LIMIT_RNC_BURST = env.int('RNC_BURST', 10)
+    RATE_LIMIT_RNC_CONCURRENCY = env.int('RNC_CONCURRENCY', 5)
+    RATE_LIMIT_RUSVECTORES_RATE = env.float('RUSVECTORES_RATE', 10)
+    RATE_LIMIT_RUSVECTORES_BURST = env.int('RUSVECTORES_BURST', 10)
+    RATE_LIMIT_RUSVECTORES_CONCURRENCY = env.int('RUSVECTORES_CONCURRENCY', 10)
+    # seconds a request might be queued
+    RATE_LIMIT_MAX_WAIT = env.float('MAX_WAIT', 10)
+
+with env.prefixed('BREAKER_'):
+    # consecutive failures to open the circuit
+    BREAKER_FAILURE_THRESHOLD = env.int('FAILURE_THRESHOLD', 5)
+    # seconds the circuit is open before a trial request
+    BREAKER_RESET_TIMEOUT = env.float('RESET_TIMEOUT', 30)
+
+with env.prefixed('RESPONSE_'):
+    # JSON responses smaller than it (in bytes) aren't compressed
+    RESPONSE_COMPRESSION_MINIMUM_SIZE = env.int('COMPRESSION_MINIMUM_SIZE', 1024)
+    RESPONSE_GZIP_LEVEL = env.int('GZIP_LEVEL', 6)
+    RESPONSE_BROTLI_LEVEL = env.int('BROTLI_LEVEL', 5)
+
+with env.prefixed('VIEW_'):
+    VIEW_CORPUS_LANG = env('CORPUS_LANG', 'en')
+    VIEW_CORPUS_PAGES_COUNT = env.int('CORPUS_PAGES_COUNT', 5)
+    # seconds the page waits for each section
+    VIEW_CORPUS_EXAMPLES_TIMEOUT = env.float('CORPUS_EXAMPLES_TIMEOUT', 10)
+    VIEW_LINKED_WORDS_TIMEOUT = env.float('LINKED_WORDS_TIMEOUT', 5)
+
+with env.prefixed('PREFETCH_'):
+    # count of words being prefetched at once
+    PREFETCH_CONCURRENCY = env.int('CONCURRENCY', 2)
+    PREFETCH_QUEUE_SIZE = env.int('QUEUE_SIZE', 10_000)
+    # seconds between the scans of the words added bypassing the API, e.g. by the migrator
+    PREFETCH_SCAN_INTERVAL = env.float('SCAN_INTERVAL', 5 * 60)
+
+with env.prefixed('SEARCH_'):
+    # seconds between reloads of the prefix index to get the writes of other processes, 0 to load it once
+    SEARCH_PREFIX_INDEX_RELOAD_INTERVAL = env.float('PREFIX_INDEX_RELOAD_INTERVAL', 60)
+
+with env.prefixed('REPETITION_'):
+    # days, a word with the longer interval is learned
+    REPETITION_MAX_INTERVAL = env.int('MAX_INTERVAL', 365)
+
+with env.prefixed('CACHE_'):
+    # 'memory' – per process, 'shared' – memory-mapped files shared by the workers of a node
+    CACHE_BACKEND = env('BACKEND', 'memory', validate=lambda backend: backend in ('memory', 'shared'))
+    CACHE_SHARED_DIR = env('SHARED_DIR', '/dev/shm' if os.path.isdir('/dev/shm') else '/tmp')
+    CACHE_LINKED_WORDS_SIZE = env.int('LINKED_WORDS_SIZE', 4096)
+    # memory tier, seconds
+    CACHE_LINKED_WORDS_TTL = env.int('LINKED_WORDS_TTL', 60 * 60)
+    # database tier, seconds
+    CACHE_LINKED_WORDS_DB_TTL = env.int('LINKED_WORDS_DB_TTL', 30 * 24 * 60 * 60)
+    # database tier of the words without synonyms, seconds
+    CACHE_LINKED_WORDS_EMPTY_DB_TTL = env.int('LINKED_WORDS_EMPTY_DB_TTL', 24 * 60 * 60)
+    # memory tier, seconds
+    CACHE_CORPUS_EXAMPLES_SIZE = env.int('CORPUS_EXAMPLES_SIZE', 1024)
+    CACHE_CORPUS_EXAMPLES_TTL = env.int('CORPUS_EXAMPLES_TTL', 60 * 60)
+    # database tier: stale examples are served while being refreshed, seconds
+    CACHE_CORPUS_EXAMPLES_FRESHNESS = env.int('CORPUS_EXAMPLES_FRESHNESS', 7 * 24 * 60 * 60)
+    # rendered HTML fragments of the view page
+    CACHE_VIEW_FRAGMENTS_SIZE = env.int('VIEW_FRAGMENTS_SIZE', 512)
+    CACHE_VIEW_FRAGMENTS_TTL = env.int('VIEW_FRAGMENTS_TTL', 60 * 60)
+
 os.environ.clear()
@@ -0,0 +1,57 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class _Call:
+    __slots__ = 'task', 'waiters'
+
+    def __init__(self,
+                 task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """ Coalesce concurrent calls with the same key,
+    so that all callers await one upstream call.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[Hashable, _Call] = {}
+        self.coalesced = 0
+
+    async def do(self,
+                 key: Hashable,
+                 func: Callable[[], Awaitable[Any]]) -> Any:
+        if (call := self._calls.get(key)) is None:
+            call = self._start(key, func)
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            # a cancelled caller mustn't cancel the call for the others
+            return await asyncio.shield(call.task)
+        except asyncio.CancelledError:
+            if call.waiters == 1 and not call.task.done():
+                call.task.cancel()
+            raise
+        finally:
+            call.waiters -= 1
+
+    def _start(self,
+               key: Hashable,
+               func: Callable[[], Awaitable[Any]]) -> _Call:
+        call = _Call(asyncio.ensure_future(func()))
+
+        def _done(_: asyncio.Task) -> None:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+        call.task.add_done_callback(_done)
+        self._calls[key] = call
+        return call
+
+    def __len__(self) -> int:
+        """ Count of calls in flight """
+        return len(self._calls)
@@ -1,32 +1,432 @@
-from typing import Any
+import asyncio
+import datetime
+import functools
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterable, Optional
 
-import rnc
+import pydantic
+import sqlalchemy.sql as sa
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import RowMapping
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from vocabulary.common import settings
+from vocabulary.common import breaker, cache, database, http, metrics, ratelimit, settings, singleflight
 from vocabulary.common.log import logger
+from vocabulary.examples import records, texts
+from vocabulary.models import models
+from vocabulary.words import lemmas
 
+if TYPE_CHECKING:
+    import rnc
 
-async def get_corpus_examples(*,
-                              mycorp: str,
-                              word: str,
-                              pages_count: int) -> list[dict[str, Any]]:
-    corp = rnc.ParallelCorpus(
+
+# (word, mycorp, pages_count) -> running refresh
+_refreshing: dict[tuple[str, str, int], asyncio.Task] = {}
+corpus_examples_cache = cache.create_cache(
+    'corpus_examples',
+    maxsize=settings.CACHE_CORPUS_EXAMPLES_SIZE,
+    ttl=settings.CACHE_CORPUS_EXAMPLES_TTL,
+    # 10 compressed pages fit
+    slot_size=64 * 1024
+)
+corpus_examples_flight = singleflight.SingleFlight()
+rnc_limiter = ratelimit.RateLimiter(
+    'rnc',
+    rate=settings.RATE_LIMIT_RNC_RATE,
+    burst=settings.RATE_LIMIT_RNC_BURST,
+    concurrency=settings.RATE_LIMIT_RNC_CONCURRENCY,
+    max_wait=settings.RATE_LIMIT_MAX_WAIT
+)
+rnc_breaker = breaker.CircuitBreaker(
+    'rnc',
+    failure_threshold=settings.BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.BREAKER_RESET_TIMEOUT,
+    ignore=(ratelimit.RateLimitExceeded, )
+)
+metrics.register_cache('corpus_examples', corpus_examples_cache)
+metrics.register_flight('corpus_examples', corpus_examples_flight)
+# count of pages requested at once while streaming
+STREAM_PAGES_WINDOW = 5
+# sentences inserted at once while adding a text
+SENTENCES_BATCH_SIZE = 1000
+# (word form, sentence id) pairs per INSERT, asyncpg allows up to 32767 bind params
+WORD_FORMS_CHUNK_SIZE = 10000
+
+
+@functools.cache
+def _rnc():
+    """ rnc (with bs4 and lxml) is imported on the first request to RNC """
+    import rnc
+    import rnc.corpora
+
+    # rnc requests the URL of the module
+    rnc.corpora.RNC_URL = settings.RNC_URL
+    # unknown words and words with fewer pages are answers of RNC, not its failures
+    rnc_breaker.ignore += (rnc.corpora_requests.NoResultFound,
+                           rnc.corpora_requests.LastPageDoesntExist)
+    return rnc
+
+
+def _create_corpus(*,
+                   mycorp: str,
+                   word: str,
+                   pages_count: int) -> 'rnc.ParallelCorpus':
+    lib = _rnc()
+    return lib.ParallelCorpus(
         word, pages_count,
-        mycorp=rnc.mycorp[mycorp],
+        mycorp=lib.mycorp[mycorp],
         marker=settings.CORPUS_EXAMPLES_MARKER
     )
+
+
+def _to_records(examples: Iterable['rnc.ParallelExample'],
+                mycorp: str) -> list[records.CorpusExample]:
+    """ Validate the examples got from RNC, the invalid ones are skipped """
+    valid = []
+    for ex in examples:
+        try:
+            valid.append(records.CorpusExample.validate({
+                'original': getattr(ex, mycorp),
+                'native': ex.ru,
+                'src': ex.src,
+                'ambiguation': ex.ambiguation,
+                'doc_url': ex.doc_url,
+                'found_wordforms': ex.found_wordforms
+            }))
+        except pydantic.ValidationError as e:
+            logger.warning("Invalid corpus example skipped: %s", str(e))
+    return valid
+
+
+class _CorpusPages:
+    """ Pages of the corpus requested and parsed one by one,
+    ParallelCorpus requests all of them at once.
+
+    It's the only place relying on the internals of rnc,
+    they're checked against rnc 0.9.0 pinned in pyproject.toml.
+    """
+
+    def __init__(self,
+                 corp: 'rnc.ParallelCorpus',
+                 mycorp: str) -> None:
+        self._corp = corp
+        self.mycorp = mycorp
+
+    @property
+    def params(self) -> dict[str, Any]:
+        return self._corp.params
+
+    def parse(self,
+              html: str) -> list[records.CorpusExample]:
+        # the page parser of the 'normal' output
+        return _to_records(self._corp._parse_page_normal(html), self.mycorp)
+
+    @staticmethod
+    def exists(html: str,
+               page: int,
+               first_page: str) -> bool:
+        """ RNC redirects to the first page if the requested one doesn't exist.
+        The pager shows the numbers up to the last page, it's checked like
+        rnc.corpora_requests.does_page_exist_async does to raise LastPageDoesntExist.
+        """
+        import bs4
+
+        soup = bs4.BeautifulSoup(html, 'lxml', parse_only=bs4.SoupStrainer('p', class_='pager'))
+        if (pager := soup.find('p', class_='pager')) is None:
+            return html != first_page
+
+        numbers = [int(link.text) for link in pager.find_all('a') if link.text.isdigit()]
+        return bool(numbers) and max(numbers) > page
+
+
+@metrics.timed(metrics.UPSTREAM_LATENCY, upstream='rnc')
+async def _scrape_corpus_examples(*,
+                                  mycorp: str,
+                                  word: str,
+                                  pages_count: int) -> list[records.CorpusExample]:
+    corp = _create_corpus(mycorp=mycorp, word=word, pages_count=pages_count)
     logger.info("Requesting corpus examples")
     await corp.request_examples_async()
     logger.info("%s corpus examples got", len(corp))
 
-    return [
-        {
-            'original': getattr(ex, mycorp),
-            'native': ex.ru,
-            'src': ex.src,
-            'ambiguation': ex.ambiguation,
-            'doc_url': ex.doc_url,
-            'found_wordforms': ex.found_wordforms
-         }
-        for ex in corp
+    return await asyncio.to_thread(_to_records, corp, mycorp)
+
+
+@rnc_breaker.guard
+async def _request_corpus_examples(*,
+                                   mycorp: str,
+                                   word: str,
+                                   pages_count: int) -> list[records.CorpusExample]:
+    # rnc requests the pages itself with its own session, so the
+    # scrape takes a token per page and one slot of the limiter
+    await rnc_limiter.acquire(cost=pages_count)
+    try:
+        return await _scrape_corpus_examples(mycorp=mycorp, word=word, pages_count=pages_count)
+    finally:
+        rnc_limiter.release()
+
+
+@rnc_breaker.guard
+@rnc_limiter.limit
+@metrics.timed(metrics.UPSTREAM_LATENCY, upstream='rnc')
+async def _request_corpus_page(params: dict[str, Any],
+                               page: int) -> str:
+    async with http.client() as ses:
+        async with ses.get(settings.RNC_URL, params={**params, 'p': page}) as resp:
+            resp.raise_for_status()
+            return await resp.text('utf-8')
+
+
+async def _get_stored_corpus_examples(*,
+                                      mycorp: str,
+                                      word: str,
+                                      pages_count: int) -> Optional[RowMapping]:
+    stmt = sa.select([models.CorpusExamples.c.examples,
+                      models.CorpusExamples.c.fetched_at])\
+        .where(models.CorpusExamples.c.word == word)\
+        .where(models.CorpusExamples.c.lang == mycorp)\
+        .where(models.CorpusExamples.c.pages_count == pages_count)
+
+    try:
+        async with database.session() as ses:
+            return (await ses.execute(stmt)).mappings().one_or_none()
+    except database.DatabaseError:
+        return None
+
+
+async def _store_corpus_examples(*,
+                                 mycorp: str,
+                                 word: str,
+                                 pages_count: int,
+                                 examples: list[records.CorpusExample]) -> None:
+    stmt = insert(models.CorpusExamples)\
+        .values(word=word, lang=mycorp, pages_count=pages_count,
+                examples=[example.to_dict() for example in examples], fetched_at=datetime.datetime.utcnow())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.CorpusExamples.c.word,
+                        models.CorpusExamples.c.lang,
+                        models.CorpusExamples.c.pages_count],
+        set_={
+            'examples': stmt.excluded.examples,
+            'fetched_at': stmt.excluded.fetched_at
+        }
+    )
+
+    try:
+        async with database.session() as ses:
+            await ses.execute(stmt)
+    except database.DatabaseError:
+        pass
+
+
+def _found_wordforms(examples: list[records.CorpusExample]) -> set[str]:
+    return {
+        form
+        for example in examples
+        for form in example.found_wordforms
+    }
+
+
+async def _refresh_corpus_examples(**kwargs) -> list[records.CorpusExample]:
+    examples = await _request_corpus_examples(**kwargs)
+    await _store_corpus_examples(**kwargs, examples=examples)
+    corpus_examples_cache.set(_cache_key(**kwargs), examples)
+    await lemmas.add_forms(kwargs['word'], _found_wordforms(examples), kwargs['mycorp'])
+
+    return examples
+
+
+def _cache_key(*,
+               mycorp: str,
+               word: str,
+               pages_count: int) -> tuple[str, str, int]:
+    return word, mycorp, pages_count
+
+
+def _refresh_in_background(*,
+                           mycorp: str,
+                           word: str,
+                           pages_count: int) -> None:
+    key = _cache_key(mycorp=mycorp, word=word, pages_count=pages_count)
+    if key in _refreshing:
+        return
+
+    def _done(task: asyncio.Task) -> None:
+        _refreshing.pop(key, None)
+        if not task.cancelled() and (exc := task.exception()) is not None:
+            logger.error("Error refreshing corpus examples for %s: %s", key, repr(exc))
+
+    logger.debug("Refreshing stale corpus examples for %s", key)
+    task = asyncio.create_task(_refresh_corpus_examples(
+        mycorp=mycorp, word=word, pages_count=pages_count))
+    task.add_done_callback(_done)
+    _refreshing[key] = task
+
+
+async def _get_corpus_examples(**kwargs) -> list[records.CorpusExample]:
+    """ Stored examples are returned at once, the stale
+    ones are refreshed in background (stale-while-revalidate)
+    unless the circuit of RNC is open.
+    """
+    if (stored := await _get_stored_corpus_examples(**kwargs)) is None:
+        return await _refresh_corpus_examples(**kwargs)
+
+    fresh_since = datetime.datetime.utcnow() - datetime.timedelta(
+        seconds=settings.CACHE_CORPUS_EXAMPLES_FRESHNESS)
+    if stored.fetched_at < fresh_since and not rnc_breaker.is_open:
+        _refresh_in_background(**kwargs)
+
+    examples = [records.CorpusExample.from_stored(example) for example in stored.examples]
+    corpus_examples_cache.set(_cache_key(**kwargs), examples)
+    return examples
+
+
+@metrics.timed(metrics.CORPUS_EXAMPLES_LATENCY)
+async def get_corpus_examples(*,
+                              mycorp: str,
+                              word: str,
+                              pages_count: int) -> list[records.CorpusExample]:
+    # inflected forms share the examples of the lemma
+    word = lemmas.lemmatize(word.lower().strip(), mycorp)
+    key = _cache_key(mycorp=mycorp, word=word, pages_count=pages_count)
+
+    if (examples := corpus_examples_cache.get(key)) is None:
+        examples = await corpus_examples_flight.do(
+            key,
+            lambda: _get_corpus_examples(mycorp=mycorp, word=word, pages_count=pages_count)
+        )
+    # the list is shared between the coalesced callers and the cache
+    return list(examples)
+
+
+async def stream_corpus_examples(*,
+                                 mycorp: str,
+                                 word: str,
+                                 pages_count: int) -> AsyncIterator[records.CorpusExample]:
+    """ Yield examples page by page as soon as they are parsed.
+
+    Stored examples are yielded if they exist, otherwise not more than
+    STREAM_PAGES_WINDOW pages are held in memory at once.
+    Streamed examples aren't stored to keep the memory flat.
+    """
+    word = lemmas.lemmatize(word.lower().strip(), mycorp)
+
+    stored = await _get_stored_corpus_examples(mycorp=mycorp, word=word, pages_count=pages_count)
+    if stored is not None:
+        for example in stored.examples:
+            yield records.CorpusExample.from_stored(example)
+        return
+
+    corpus = _CorpusPages(
+        _create_corpus(mycorp=mycorp, word=word, pages_count=pages_count), mycorp)
+
+    logger.info("Streaming corpus examples")
+    first_page = await _request_corpus_page(corpus.params, 0)
+    found_wordforms: set[str] = set()
+    for example in await asyncio.to_thread(corpus.parse, first_page):
+        found_wordforms.update(example.found_wordforms)
+        yield example
+
+    async def _request_page(page: int) -> tuple[int, str]:
+        return page, await _request_corpus_page(corpus.params, page)
+
+    for window_start in range(1, pages_count, STREAM_PAGES_WINDOW):
+        window_stop = min(window_start + STREAM_PAGES_WINDOW, pages_count)
+        pages = [
+            _request_page(page)
+            for page in range(window_start, window_stop)
+        ]
+
+        last_page_reached = False
+        for request in asyncio.as_completed(pages):
+            page, html = await request
+            if not await asyncio.to_thread(corpus.exists, html, page, first_page):
+                last_page_reached = True
+                continue
+
+            for example in await asyncio.to_thread(corpus.parse, html):
+                found_wordforms.update(example.found_wordforms)
+                yield example
+
+        if last_page_reached:
+            break
+
+    await lemmas.add_forms(word, found_wordforms, mycorp)
+
+
+async def _add_sentences(ses: AsyncSession,
+                         text_id: str,
+                         sentences: list[str]) -> None:
+    # the ids are allocated before the insert, RETURNING
+    # isn't guaranteed to keep the order of the values
+    sequence = sa.func.pg_get_serial_sequence(models.Sentence.name, models.Sentence.c.sentence_id.name)
+    ids_stmt = sa.select(sa.func.nextval(sequence))\
+        .select_from(sa.func.generate_series(1, len(sentences)))
+    sentence_ids = (await ses.execute(ids_stmt)).scalars().all()
+
+    await ses.execute(
+        models.Sentence.insert().values([
+            {'sentence_id': sentence_id, 'text_id': text_id, 'sentence': sentence}
+            for sentence_id, sentence in zip(sentence_ids, sentences)
+        ])
+    )
+
+    index = [
+        {'word_form': form, 'sentence_id': sentence_id}
+        for sentence_id, sentence in zip(sentence_ids, sentences)
+        for form in texts.word_forms(sentence)
     ]
+    for start in range(0, len(index), WORD_FORMS_CHUNK_SIZE):
+        await ses.execute(
+            models.WordFormSentence.insert().values(index[start:start + WORD_FORMS_CHUNK_SIZE])
+        )
+
+
+async def add_text(*,
+                   title: str,
+                   chunks: AsyncIterator[bytes]) -> tuple[str, int]:
+    """ Split the text to sentences and index their word forms
+    while the text is being read, in one transaction.
+
+    :return: text id and count of sentences.
+    """
+    count, batch = 0, []
+    stmt = models.Text.insert()\
+        .values(title=title)\
+        .returning(models.Text.c.text_id)
+
+    async with database.session() as ses:
+        text_id = (await ses.execute(stmt)).scalar_one()
+
+        async for sentence in texts.split_sentences(chunks):
+            batch += [sentence]
+            if len(batch) >= SENTENCES_BATCH_SIZE:
+                await _add_sentences(ses, text_id, batch)
+                count += len(batch)
+                batch = []
+
+        if batch:
+            await _add_sentences(ses, text_id, batch)
+            count += len(batch)
+
+    logger.info("Text '%s' added, %s sentences", title, count)
+    return text_id, count
+
+
+async def get_self_examples(*,
+                            word: str,
+                            limit: Optional[int] = None) -> list[RowMapping]:
+    """ Sentences from the uploaded texts found through the word form index """
+    stmt = sa.select(models.Sentence.c.sentence,
+                     models.Text.c.text_id,
+                     models.Text.c.title)\
+        .select_from(models.WordFormSentence)\
+        .join(models.Sentence,
+              models.Sentence.c.sentence_id == models.WordFormSentence.c.sentence_id)\
+        .join(models.Text,
+              models.Text.c.text_id == models.Sentence.c.text_id)\
+        .where(models.WordFormSentence.c.word_form == word.lower().strip())\
+        .order_by(models.WordFormSentence.c.sentence_id)\
+        .limit(limit)
+
+    async with database.session() as ses:
+        return (await ses.execute(stmt)).mappings().all()
@@ -0,0 +1,84 @@
+""" Corpus examples as compact records, validated once when they're ingested """
+from typing import Any
+
+import ujson
+
+from vocabulary.examples import schemas
+
+
+class CorpusExample:
+    __slots__ = ('original', 'native', 'src', 'ambiguation', 'doc_url', 'found_wordforms')
+
+    def __init__(self,
+                 original: str,
+                 native: str,
+                 src: str,
+                 ambiguation: bool,
+                 doc_url: str,
+                 found_wordforms: tuple[str, ...]) -> None:
+        self.original = original
+        self.native = native
+        self.src = src
+        self.ambiguation = ambiguation
+        self.doc_url = doc_url
+        self.found_wordforms = found_wordforms
+
+    @classmethod
+    def validate(cls,
+                 example: dict[str, Any]) -> 'CorpusExample':
+        """ Validate an example got from RNC.
+
+        :exception pydantic.ValidationError: if the example is invalid.
+        """
+        valid = schemas.CorpusExample(**example)
+        return cls(
+            valid.original, valid.native, valid.src,
+            valid.ambiguation, str(valid.doc_url), valid.found_wordforms
+        )
+
+    @classmethod
+    def from_stored(cls,
+                    example: dict[str, Any]) -> 'CorpusExample':
+        """ Stored examples have already been validated """
+        ambiguation = example['ambiguation']
+        # the ones stored before validating keep the RNC string
+        if isinstance(ambiguation, str):
+            ambiguation = ambiguation.lower() == 'disambiguated'
+
+        return cls(
+            example['original'], example['native'], example['src'],
+            ambiguation, example['doc_url'], tuple(example['found_wordforms'])
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            'original': self.original,
+            'native': self.native,
+            'src': self.src,
+            'ambiguation': self.ambiguation,
+            'doc_url': self.doc_url,
+            'found_wordforms': self.found_wordforms
+        }
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, CorpusExample):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}(original={self.original!r}, src={self.src!r})"
+
+
+def dumps(obj: Any) -> bytes:
+    """ ujson is several times faster than json """
+    return ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def dump_examples(examples: list[CorpusExample],
+                  lang: str) -> bytes:
+    """ The body of schemas.CorpusExamples without validating it again """
+    return dumps({
+        'examples': [example.to_dict() for example in examples],
+        'count': len(examples),
+        'lang': lang
+    })
@@ -1,6 +1,11 @@
-from fastapi import APIRouter, Query, params
+from typing import AsyncIterator, Optional
 
-from vocabulary.examples import schemas, db
+from fastapi import APIRouter, Query, Request, params
+from fastapi.responses import Response, StreamingResponse
+
+from vocabulary.common import settings
+from vocabulary.common.log import logger
+from vocabulary.examples import records, schemas, db
 
 
 router = APIRouter(
@@ -12,26 +17,89 @@ router = APIRouter(
 @router.get('/corpus/{word}',
             response_model=schemas.CorpusExamples)
 async def get_corpus_examples(word: str,
-                              pages_count: int = Query(10, ge=1),
+                              pages_count: int = Query(10, ge=1, le=settings.RATE_LIMIT_RNC_BURST),
                               lang: schemas.LANGUAGES = Query('en')): # type: ignore
     if isinstance(lang, params.Query):
         lang = lang.default # type: ignore
     if isinstance(pages_count, params.Query):
         pages_count = pages_count.default
 
+    # the examples are validated when they're got from RNC,
+    # so the response model documents the body, it isn't checked
     examples = await db.get_corpus_examples(
         word=word, mycorp=lang, pages_count=pages_count
     )
-    examples.sort(key=lambda ex: len(ex['original']))
+    examples.sort(key=lambda ex: len(ex.original))
+
+    return Response(
+        records.dump_examples(examples, lang),
+        media_type='application/json'
+    )
+
+
+@router.get('/corpus/{word}/stream',
+            response_class=StreamingResponse,
+            responses={200: {'content': {'application/x-ndjson': {}}}})
+async def stream_corpus_examples(word: str,
+                                 pages_count: int = Query(10, ge=1, le=settings.RATE_LIMIT_RNC_BURST),
+                                 lang: schemas.LANGUAGES = Query('en')): # type: ignore
+    """ Corpus examples as newline-delimited JSON
+    in the order the pages are parsed, not sorted.
+
+    If the examples fail after the first one, the last record is {"error": ...}.
+    """
+    examples = db.stream_corpus_examples(
+        word=word, mycorp=lang, pages_count=pages_count
+    )
+    # the first example is got before the headers are sent,
+    # so the errors of the first page get their status
+    try:
+        first: Optional[records.CorpusExample] = await examples.__anext__()
+    except StopAsyncIteration:
+        first = None
+
+    async def _ndjson() -> AsyncIterator[bytes]:
+        if first is None:
+            return
+
+        yield records.dumps(first.to_dict()) + b'\n'
+        try:
+            async for example in examples:
+                yield records.dumps(example.to_dict()) + b'\n'
+        except Exception:
+            logger.exception("Error streaming corpus examples")
+            yield records.dumps({'error': "Corpus examples are incomplete, try again later"}) + b'\n'
+
+    return StreamingResponse(_ndjson(), media_type='application/x-ndjson')
+
+
+@router.post('/self/texts',
+             response_model=schemas.TextAdded,
+             openapi_extra={'requestBody': {
+                 'content': {'text/plain': {'schema': {'type': 'string'}}},
+                 'required': True
+             }})
+async def add_text(request: Request,
+                   title: str = Query(..., min_length=1)):
+    """ Upload a text (book, article) as the raw body,
+    it's indexed while being read.
+    """
+    text_id, count = await db.add_text(title=title, chunks=request.stream())
 
     return {
-        "examples": examples,
-        "count": len(examples),
-        "lang": lang
+        'text_id': text_id,
+        'sentences_count': count
     }
 
 
 @router.get('/self/{word}',
             response_model=schemas.SelfExamples)
-async def get_self_examples(word: str):
-    pass
+async def get_self_examples(word: str,
+                            limit: int = Query(100, ge=1)):
+    examples = await db.get_self_examples(word=word, limit=limit)
+
+    return {
+        'word': word,
+        'examples': examples,
+        'count': len(examples)
+    }
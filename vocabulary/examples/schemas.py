@@ -1,13 +1,14 @@
-from typing import Literal
+from typing import Literal, Union
+from uuid import UUID
 
 from pydantic import BaseModel, HttpUrl, validator
-from rnc import mycorp
 
 
-LANGUAGES = Literal[tuple( # type: ignore
-    k for k in mycorp.Parallel.__dict__.keys()
-    if k[0].islower()
-)]
+# languages of rnc.mycorp.Parallel, listed not to import rnc at startup
+LANGUAGES = Literal[
+    'arm', 'bas', 'bel', 'bul', 'bur', 'ch', 'cz', 'en', 'es', 'fin',
+    'fr', 'ger', 'it', 'lat', 'lit', 'pol', 'sp', 'sw', 'ukr'
+]
 
 
 class CorpusExample(BaseModel):
@@ -20,7 +21,9 @@ class CorpusExample(BaseModel):
 
     @validator('ambiguation', pre=True)
     def validate_ambiguation(cls,
-                             amb: str) -> bool:
+                             amb: Union[str, bool]) -> bool:
+        if isinstance(amb, bool):
+            return amb
         return amb.lower() == 'disambiguated'
 
 
@@ -30,5 +33,18 @@ class CorpusExamples(BaseModel):
     count: int = 0
 
 
+class SelfExample(BaseModel):
+    sentence: str
+    text_id: UUID
+    title: str
+
+
 class SelfExamples(BaseModel):
-    pass
+    word: str
+    examples: list[SelfExample]
+    count: int = 0
+
+
+class TextAdded(BaseModel):
+    text_id: UUID
+    sentences_count: int
@@ -0,0 +1,52 @@
+""" Splitting uploaded texts to sentences and word forms """
+import codecs
+import re
+from typing import AsyncIterator
+
+
+SENTENCE_END = re.compile(r'(?<=[.!?…])["»”)\]]*\s+')
+WORD_FORM = re.compile(r"\w+(?:['’-]\w+)*")
+WORD_FORM_PARTS = re.compile(r"['’-]")
+SPACES = re.compile(r'\s+')
+# a text without punctuation mustn't be kept in memory at once
+MAX_SENTENCE_LENGTH = 5000
+
+
+def _clean(sentence: str) -> str:
+    return SPACES.sub(' ', sentence).strip()
+
+
+async def split_sentences(chunks: AsyncIterator[bytes],
+                          encoding: str = 'utf-8') -> AsyncIterator[str]:
+    """ Yield sentences while the text is being read,
+    only the unfinished sentence is kept in memory.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    tail = ''
+
+    async for chunk in chunks:
+        tail += decoder.decode(chunk)
+
+        *sentences, tail = SENTENCE_END.split(tail)
+        while len(tail) > MAX_SENTENCE_LENGTH:
+            # cut at the last space not to break a word
+            cut = tail.rfind(' ', 0, MAX_SENTENCE_LENGTH) + 1 or MAX_SENTENCE_LENGTH
+            sentences += [tail[:cut]]
+            tail = tail[cut:]
+
+        for sentence in sentences:
+            if sentence := _clean(sentence):
+                yield sentence
+
+    if tail := _clean(tail + decoder.decode(b'', final=True)):
+        yield tail
+
+
+def word_forms(sentence: str) -> set[str]:
+    """ Lowered word forms, compound ones with their parts """
+    forms = set()
+    for form in WORD_FORM.findall(sentence.lower()):
+        forms.add(form)
+        forms.update(WORD_FORM_PARTS.split(form))
+
+    return forms
@@ -1,14 +1,17 @@
-import uvicorn
+import time
+
 from fastapi import FastAPI
 from fastapi.exceptions import RequestValidationError
 from fastapi.requests import Request
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 
-from vocabulary.common import database, settings
+from vocabulary.common import breaker, conditional, database, http, metrics, ratelimit, settings
 from vocabulary.common.log import logger
 from vocabulary.examples.routes import router as examples_router
+from vocabulary.system.routes import router as system_router
 from vocabulary.view.routes import router as view_router
+from vocabulary.words import lemmas, prefetch, search
 from vocabulary.words.routes import router as words_router
 
 
@@ -21,9 +24,48 @@ app = FastAPI(
 app.include_router(words_router)
 app.include_router(examples_router)
 app.include_router(view_router)
+app.include_router(system_router)
 
 app.mount("/static", StaticFiles(directory="vocabulary/static"), name="static")
 
+app.add_middleware(
+    conditional.ConditionalMiddleware,
+    minimum_size=settings.RESPONSE_COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.RESPONSE_GZIP_LEVEL,
+    brotli_level=settings.RESPONSE_BROTLI_LEVEL
+)
+# the outermost one to see the responses as they're sent
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+STARTUP_STEPS = (
+    ('http', http.startup),
+    ('database', database.startup),
+    ('prefix index', search.startup),
+    ('lemmas', lemmas.load),
+    ('prefetch', prefetch.startup),
+)
+# step -> seconds, the last startup
+startup_timings: dict[str, float] = {}
+
+
+@app.on_event("startup")
+async def startup() -> None:
+    for name, step in STARTUP_STEPS:
+        start = time.perf_counter()
+        await step()
+        startup_timings[name] = time.perf_counter() - start
+
+    logger.debug("Started in %.3fs: %s", sum(startup_timings.values()), startup_timings)
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    await prefetch.shutdown()
+    await search.shutdown()
+    await http.shutdown()
+    await database.shutdown()
+
 
 async def database_exception_handler(request: Request,
                                      exc: database.DatabaseError):
@@ -34,6 +76,26 @@ async def database_exception_handler(request: Request,
     )
 
 
+@app.exception_handler(ratelimit.RateLimitExceeded)
+async def rate_limit_exception_handler(request: Request,
+                                       exc: ratelimit.RateLimitExceeded):
+    logger.error("Upstream rate limit exceeded, %s", str(exc))
+    return JSONResponse(
+        status_code=503,
+        content={"message": "Upstream is busy, try again later"},
+    )
+
+
+@app.exception_handler(breaker.CircuitOpen)
+async def circuit_open_exception_handler(request: Request,
+                                         exc: breaker.CircuitOpen):
+    logger.warning("Upstream is unavailable, %s", str(exc))
+    return JSONResponse(
+        status_code=503,
+        content={"message": "Upstream is unavailable, try again later"},
+    )
+
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request,
                                        exc: RequestValidationError):
@@ -45,6 +107,8 @@ async def validation_exception_handler(request: Request,
 
 
 if __name__ == '__main__':
+    import uvicorn
+
     uvicorn.run(
         app,
         host=settings.API_HOST,
@@ -4,23 +4,31 @@ to the current postgresql database
 """
 import argparse
 import asyncio
+import hashlib
 import sqlite3
+import time
 from contextlib import contextmanager
+from pathlib import Path
 from typing import Iterator
 
-import requests
+from sqlalchemy.dialects.postgresql import insert
 
 from vocabulary.common import database
 from vocabulary.common.log import logger
 from vocabulary.models import models
 
 
-API_HOST = 'http://127.0.0.1:9001'
+SQLITE_PATH = Path('../eng.db')
+# the last migrated rowid of the source is stored here to resume the migration
+CHECKPOINT_DIR = Path('.')
+BATCH_SIZE = 5000
+# a row takes 3 bind params (word_id, word, added_at), asyncpg allows up to 32767
+MAX_BATCH_SIZE = 10000
 
 
 @contextmanager
-def session() -> Iterator[sqlite3.Connection]:
-    conn = sqlite3.connect('../eng.db')
+def session(path: Path = SQLITE_PATH) -> Iterator[sqlite3.Connection]:
+    conn = sqlite3.connect(path)
     try:
         yield conn
         conn.commit()
@@ -31,29 +39,84 @@ def session() -> Iterator[sqlite3.Connection]:
         conn.close()
 
 
-def get_words_to_learn() -> list[str]:
+def get_words_to_learn(*,
+                       path: Path = SQLITE_PATH,
+                       after: int = 0,
+                       batch_size: int = BATCH_SIZE) -> Iterator[list[tuple[int, str]]]:
+    """ Stream (rowid, word) batches ordered by rowid """
     stmt = """
-    SELECT word FROM words_to_learn;
+    SELECT rowid, word FROM words_to_learn WHERE rowid > ? ORDER BY rowid;
     """
 
-    with session() as ses:
-        return [
-            word[0]
-            for word in ses.execute(stmt).fetchall()
-        ]
+    with session(path) as ses:
+        cursor = ses.execute(stmt, (after, ))
+        while batch := cursor.fetchmany(batch_size):
+            yield batch
 
 
-def insert_words_to_learn(words: list[str]) -> None:
-    for word in words:
-        logger.debug("Inserting word to learn '%s'", word)
-        resp = requests.post(f"{API_HOST}/words/to-learn/add", json={"word": word})
-        resp.raise_for_status()
+async def insert_words_to_learn(words: list[str]) -> int:
+    """ Insert the batch in one statement, skip existing words.
 
+    :return: count of inserted words.
+    """
+    stmt = insert(models.WordToLearn)\
+        .values([{'word': word} for word in words])\
+        .on_conflict_do_nothing(index_elements=[models.WordToLearn.c.word])
+
+    async with database.engine.begin() as conn:
+        return (await conn.execute(stmt)).rowcount
+
+
+def checkpoint_path(source: Path) -> Path:
+    """ The checkpoint of the sqlite database, another one doesn't resume from it """
+    digest = hashlib.sha1(str(source.resolve()).encode()).hexdigest()[:16]
+    return CHECKPOINT_DIR / f".migration_checkpoint_{digest}"
+
+
+def read_checkpoint(path: Path) -> int:
+    try:
+        return int(path.read_text())
+    except FileNotFoundError:
+        return 0
+
+
+def write_checkpoint(rowid: int,
+                     path: Path) -> None:
+    path.write_text(str(rowid))
+
+
+async def migrate_words_to_learn(*,
+                                 path: Path = SQLITE_PATH,
+                                 batch_size: int = BATCH_SIZE) -> None:
+    checkpoint = checkpoint_path(path)
+    if last_rowid := read_checkpoint(checkpoint):
+        logger.info("Resuming the migration of %s after rowid=%s", path, last_rowid)
 
-def migrate_words_to_learn() -> None:
-    words = get_words_to_learn()
-    logger.info(f"Migrating {len(words)} words to learn...")
-    insert_words_to_learn(words)
+    migrated = inserted = 0
+    start = time.perf_counter()
+
+    batches = get_words_to_learn(path=path, after=last_rowid, batch_size=batch_size)
+    for batch in batches:
+        inserted += await insert_words_to_learn([word for _, word in batch])
+        migrated += len(batch)
+
+        # the batch is committed, it's safe to move the checkpoint
+        write_checkpoint(batch[-1][0], checkpoint)
+
+        elapsed = time.perf_counter() - start
+        logger.info("%s words migrated, %s inserted, %.0f rows/s",
+                    migrated, inserted, migrated / elapsed)
+
+    checkpoint.unlink(missing_ok=True)
+    logger.info("Migration completed: %s words migrated, %s inserted in %.2fs",
+                migrated, inserted, time.perf_counter() - start)
+
+
+def batch_size_arg(value: str) -> int:
+    batch_size = int(value)
+    if not 1 <= batch_size <= MAX_BATCH_SIZE:
+        raise argparse.ArgumentTypeError(f"Batch size must be in [1; {MAX_BATCH_SIZE}], but {value} found")
+    return batch_size
 
 
 async def main() -> None:
@@ -69,9 +132,23 @@ async def main() -> None:
     parser.add_argument(
         '--create-schema',
         action="store_true",
-        help="Create all tables",
+        help="Create all tables, add the new columns and indexes to the existing ones",
         dest="create_schema"
     )
+    parser.add_argument(
+        '--sqlite',
+        type=Path,
+        default=SQLITE_PATH,
+        help="Path to the sqlite database",
+        dest="sqlite"
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=batch_size_arg,
+        default=BATCH_SIZE,
+        help=f"Count of rows inserted at once, up to {MAX_BATCH_SIZE}",
+        dest="batch_size"
+    )
     args = parser.parse_args()
 
     if args.create_schema:
@@ -79,7 +156,7 @@ async def main() -> None:
             await conn.run_sync(models.metadata.create_all)
 
     if args.migrate:
-        migrate_words_to_learn()
+        await migrate_words_to_learn(path=args.sqlite, batch_size=args.batch_size)
 
 
 if __name__ == '__main__':
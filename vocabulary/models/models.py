@@ -1,13 +1,37 @@
 import datetime
 import uuid
 
-from sqlalchemy import Column, Unicode, DateTime, Table, MetaData
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
+from sqlalchemy import Column, Unicode, DateTime, Table, MetaData, Integer, Index, DDL, event, Float, text, \
+    BigInteger, ForeignKey
+from sqlalchemy.engine import Connection
+from sqlalchemy.dialects.postgresql import UUID, ARRAY, JSONB
 
 
 metadata = MetaData()
 utcnow = datetime.datetime.utcnow
 
+# trigram indexes for the fuzzy search
+event.listen(metadata, 'before_create', DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+# create_all skips the existing tables, bring the ones
+# created before the spaced repetition up to date
+event.listen(metadata, 'after_create', DDL(
+    "ALTER TABLE words_to_learn "
+    "ADD COLUMN IF NOT EXISTS ease FLOAT NOT NULL DEFAULT 2.5, "
+    "ADD COLUMN IF NOT EXISTS interval_days INTEGER NOT NULL DEFAULT 0, "
+    "ADD COLUMN IF NOT EXISTS repetitions INTEGER NOT NULL DEFAULT 0, "
+    "ADD COLUMN IF NOT EXISTS due_at TIMESTAMP WITHOUT TIME ZONE DEFAULT (now() at time zone 'utc')"
+))
+
+
+@event.listens_for(metadata, 'after_create')
+def _create_missing_indexes(target: MetaData,
+                            connection: Connection,
+                            **kwargs) -> None:
+    """ The indexes added to the existing tables """
+    for table in target.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
 
 def _uuid_gen() -> str:
     return str(uuid.uuid4())
@@ -33,7 +57,10 @@ Word = Table(
     Column('word', Unicode, unique=True),
     Column('added_at', DateTime, default=utcnow),
     Column('eng_t', ARRAY(Unicode), comment='Английские дефиниции слова'),
-    Column('rus_t', ARRAY(Unicode), comment='Русские дефиниции слова')
+    Column('rus_t', ARRAY(Unicode), comment='Русские дефиниции слова'),
+
+    Index('words_word_trgm_idx', 'word',
+          postgresql_using='gin', postgresql_ops={'word': 'gin_trgm_ops'})
 )
 
 WordToLearn = Table(
@@ -42,5 +69,81 @@ WordToLearn = Table(
 
     PrimaryKey('word_id', UUID),
     Column('word', Unicode, unique=True),
+    Column('added_at', DateTime, default=utcnow),
+
+    # spaced repetition (SM-2) state, server defaults
+    # to keep the bulk inserts small
+    Column('ease', Float, server_default=text('2.5'), nullable=False),
+    Column('interval_days', Integer, server_default=text('0'), nullable=False),
+    Column('repetitions', Integer, server_default=text('0'), nullable=False),
+    # NULL means the word is learned and isn't scheduled anymore
+    Column('due_at', DateTime, server_default=text("(now() at time zone 'utc')")),
+
+    # keyset pagination
+    Index('words_to_learn_added_at_word_id_idx', 'added_at', 'word_id'),
+    Index('words_to_learn_word_trgm_idx', 'word',
+          postgresql_using='gin', postgresql_ops={'word': 'gin_trgm_ops'}),
+    # the due queue
+    Index('words_to_learn_due_at_idx', 'due_at',
+          postgresql_where=text('due_at IS NOT NULL'))
+)
+
+LinkedWords = Table(
+    'linked_words',
+    metadata,
+
+    Column('word', Unicode, primary_key=True),
+    Column('synonyms', ARRAY(Unicode), nullable=False),
+    Column('fetched_at', DateTime, default=utcnow, nullable=False)
+)
+
+CorpusExamples = Table(
+    'corpus_examples',
+    metadata,
+
+    Column('word', Unicode, primary_key=True),
+    Column('lang', Unicode, primary_key=True),
+    Column('pages_count', Integer, primary_key=True),
+    Column('examples', JSONB, nullable=False),
+    Column('fetched_at', DateTime, default=utcnow, nullable=False)
+)
+
+Text = Table(
+    'texts',
+    metadata,
+
+    PrimaryKey('text_id'),
+    Column('title', Unicode, nullable=False),
     Column('added_at', DateTime, default=utcnow)
 )
+
+Sentence = Table(
+    'sentences',
+    metadata,
+
+    Column('sentence_id', BigInteger, primary_key=True, autoincrement=True),
+    Column('text_id', UUID, ForeignKey('texts.text_id', ondelete='CASCADE'),
+           nullable=False, index=True),
+    Column('sentence', Unicode, nullable=False)
+)
+
+# inverted index: lowered word form -> sentences with it
+WordFormSentence = Table(
+    'word_form_sentences',
+    metadata,
+
+    Column('word_form', Unicode, primary_key=True),
+    Column('sentence_id', BigInteger, ForeignKey('sentences.sentence_id', ondelete='CASCADE'),
+           primary_key=True)
+)
+
+# word forms seen in the corpus examples -> the requested word,
+# per language, it replaces 'word_forms' of all the languages at once
+WordForm = Table(
+    'word_lemmas',
+    metadata,
+
+    Column('lang', Unicode, primary_key=True),
+    Column('word_form', Unicode, primary_key=True),
+    Column('lemma', Unicode, nullable=False)
+)
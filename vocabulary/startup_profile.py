@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+""" Show how long the imports and the startup steps take.
+
+    python -m vocabulary.startup_profile
+
+The modules are imported in dependency order, so every line
+shows the cost of the module and the libraries it brings first.
+The dependencies imported on the first use are shown apart.
+"""
+import asyncio
+import importlib
+import sys
+import time
+
+
+MODULES = (
+    'vocabulary.common.settings',
+    'vocabulary.common.metrics',
+    'vocabulary.common.database',
+    'vocabulary.models.models',
+    'vocabulary.words.routes',
+    'vocabulary.examples.routes',
+    'vocabulary.view.routes',
+    'vocabulary.system.routes',
+    'vocabulary.main',
+)
+# imported on the first request to an upstream or the first rendering
+LAZY_MODULES = (
+    'aiohttp',
+    'rnc',
+    'jinja2',
+    'fastapi.templating',
+)
+
+
+def _import(name: str) -> tuple[float, int]:
+    """ Seconds and count of the newly imported modules """
+    modules_before = len(sys.modules)
+    start = time.perf_counter()
+    importlib.import_module(name)
+    return time.perf_counter() - start, len(sys.modules) - modules_before
+
+
+def _print(name: str,
+           seconds: float,
+           note: str = '') -> None:
+    print(f"  {name:<32}{seconds * 1000:>10.1f}ms  {note}")
+
+
+async def _startup() -> None:
+    from vocabulary.main import shutdown, startup, startup_timings
+
+    await startup()
+    print("Startup steps:")
+    for name, seconds in startup_timings.items():
+        _print(name, seconds)
+    _print('total', sum(startup_timings.values()))
+
+    await shutdown()
+
+
+def main() -> None:
+    total = 0.0
+    print("Imports:")
+    for name in MODULES:
+        seconds, count = _import(name)
+        total += seconds
+        _print(name, seconds, f"{count} modules")
+    _print('total', total)
+
+    asyncio.run(_startup())
+
+    print("Imported on the first use:")
+    for name in LAZY_MODULES:
+        seconds, count = _import(name)
+        _print(name, seconds, f"{count} modules")
+
+
+if __name__ == '__main__':
+    main()
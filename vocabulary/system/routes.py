@@ -0,0 +1,57 @@
+from fastapi import APIRouter
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from vocabulary.common import breaker, database, metrics
+from vocabulary.system import schemas
+
+
+router = APIRouter(
+    tags=['system']
+)
+
+
+@router.get('/health',
+            response_model=schemas.Health)
+async def get_health():
+    """ Liveness, doesn't touch the data """
+    return {
+        'status': 'ok'
+    }
+
+
+@router.get('/ready',
+            response_model=schemas.Readiness,
+            responses={503: {'model': schemas.Readiness}})
+async def get_readiness():
+    """ The last background database ping, the pool stats
+    and the circuits of the upstreams.
+
+    Open circuits don't make the app unready,
+    the pages degrade without the upstreams.
+    """
+    readiness = schemas.Readiness(
+        ready=database.last_ping['ok'],
+        database=database.last_ping,
+        pool=database.pool_stats(),
+        upstreams={
+            name: circuit.stats()
+            for name, circuit in breaker.breakers.items()
+        }
+    )
+    status_code = 200 if readiness.ready else 503
+
+    return JSONResponse(
+        status_code=status_code,
+        content=jsonable_encoder(readiness)
+    )
+
+
+@router.get('/metrics',
+            response_class=PlainTextResponse)
+async def get_metrics():
+    """ Metrics in Prometheus text format """
+    return PlainTextResponse(
+        metrics.render(),
+        media_type='text/plain; version=0.0.4'
+    )
@@ -0,0 +1,36 @@
+import datetime
+from typing import Literal, Optional
+
+from pydantic import BaseModel
+
+
+class Health(BaseModel):
+    status: str
+
+
+class DatabasePing(BaseModel):
+    ok: bool
+    checked_at: Optional[datetime.datetime]
+    wait_time: Optional[float]
+    latency: Optional[float]
+    error: Optional[str]
+
+
+class PoolStats(BaseModel):
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+
+
+class Circuit(BaseModel):
+    state: Literal['closed', 'open', 'half_open']
+    failures: int
+    opened_for: Optional[float]
+
+
+class Readiness(BaseModel):
+    ready: bool
+    database: DatabasePing
+    pool: PoolStats
+    upstreams: dict[str, Circuit]
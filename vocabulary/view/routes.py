@@ -1,11 +1,21 @@
+import asyncio
+import functools
+import hashlib
+from typing import TYPE_CHECKING, Any, Awaitable, Iterable, Optional
+
 from fastapi import APIRouter, Body
 from fastapi.requests import Request
 from fastapi.responses import HTMLResponse
-from fastapi.templating import Jinja2Templates
+from markupsafe import Markup
 
+from vocabulary.common import breaker, cache, metrics, settings
 from vocabulary.common.log import logger
-from vocabulary.examples import routes as example_routes
-from vocabulary.words import routes as word_routes
+from vocabulary.examples import db as examples_db
+from vocabulary.examples.records import CorpusExample
+from vocabulary.words import db as words_db
+
+if TYPE_CHECKING:
+    from fastapi.templating import Jinja2Templates
 
 
 router = APIRouter(
@@ -13,33 +23,152 @@ router = APIRouter(
     tags=['view']
 )
 
-templates = Jinja2Templates(directory="vocabulary/templates")
+
+@functools.cache
+def templates() -> 'Jinja2Templates':
+    """ Jinja is imported on the first rendering """
+    from fastapi.templating import Jinja2Templates
+    from jinja2 import FileSystemBytecodeCache
+
+    jinja_templates = Jinja2Templates(directory="vocabulary/templates")
+    jinja_templates.env.bytecode_cache = FileSystemBytecodeCache()
+    return jinja_templates
+
+
+fragments_cache = cache.LRUCache(
+    maxsize=settings.CACHE_VIEW_FRAGMENTS_SIZE,
+    ttl=settings.CACHE_VIEW_FRAGMENTS_TTL
+)
+metrics.register_cache('view_fragments', fragments_cache)
+
+
+def _version(fields: Iterable[str]) -> bytes:
+    """ 128-bit hash of the rendered fields, a collision would serve a stale fragment """
+    return hashlib.blake2b('\x1f'.join(fields).encode('utf-8'), digest_size=16).digest()
+
+
+def _render_fragment(template: str,
+                     word: str,
+                     version: bytes,
+                     **context) -> Markup:
+    """ Render the section once per word and data version """
+    key = template, word, version
+
+    if (html := fragments_cache.get(key)) is None:
+        html = Markup(templates().get_template(template).render(**context))
+        fragments_cache.set(key, html)
+
+    return html
+
+
+def _render_sections(*,
+                     word: str = '',
+                     corpus_examples: Optional[list[CorpusExample]] = None,
+                     linked_words: Optional[list[str]] = None) -> dict[str, Markup]:
+    """ None means the section wasn't got in time """
+    corpus_examples_missing = corpus_examples is None
+    corpus_examples = corpus_examples or []
+    linked_words_missing = linked_words is None
+    linked_words = linked_words or []
+
+    return {
+        'corpus_examples_html': _render_fragment(
+            '_corpus_examples.html', word,
+            # only the fields the template shows, it's several times cheaper than pickling the examples
+            _version([
+                str(corpus_examples_missing),
+                *(field for ex in corpus_examples for field in (ex.original, ex.native, ex.src))
+            ]),
+            corpus_examples=corpus_examples,
+            corpus_examples_missing=corpus_examples_missing
+        ),
+        'linked_words_html': _render_fragment(
+            '_linked_words.html', word,
+            _version([str(linked_words_missing), *linked_words]),
+            linked_words=linked_words,
+            linked_words_missing=linked_words_missing
+        )
+    }
+
+
+# the fetches outlived their deadline, they're finished to warm the caches
+_late_fetches: set[asyncio.Future] = set()
+
+
+def _finish_in_background(fetch: asyncio.Future,
+                          section: str) -> None:
+    def _done(_: asyncio.Future) -> None:
+        _late_fetches.discard(fetch)
+        if not fetch.cancelled() and (exc := fetch.exception()) is not None:
+            logger.warning("Late fetch of %s failed: %s", section, repr(exc))
+
+    _late_fetches.add(fetch)
+    fetch.add_done_callback(_done)
+
+
+async def _with_deadline(coro: Awaitable[Any],
+                         timeout: float,
+                         section: str) -> Optional[Any]:
+    """ None if the section isn't got in time or failed.
+
+    The deadline stops only the waiting, the fetch is finished anyway.
+    """
+    fetch = asyncio.ensure_future(coro)
+    try:
+        return await asyncio.wait_for(asyncio.shield(fetch), timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Getting %s timed out after %ss", section, timeout)
+    except breaker.CircuitOpen as e:
+        logger.warning("Getting %s failed fast, %s", section, str(e))
+    except Exception:
+        logger.exception("Error getting %s", section)
+    finally:
+        if not fetch.done():
+            _finish_in_background(fetch, section)
+    return None
 
 
 @router.get('/', response_class=HTMLResponse)
 async def get_view(request: Request):
-    return templates.TemplateResponse('view.html', {'request': request})
+    context = {
+        'request': request,
+        **_render_sections(corpus_examples=[], linked_words=[])
+    }
+
+    return templates().TemplateResponse('view.html', context)
 
 
 @router.post('/', response_class=HTMLResponse)
 async def post_view(request: Request, word: str = Body(...)):
     word = word.split('=')[-1]
-    corpus_examples, linked_words = {}, {}
 
-    try:
-        corpus_examples = await example_routes.get_corpus_examples(word, pages_count=5)
-    except Exception:
-        logger.exception("Error getting corpus examples")
-    try:
-        linked_words = await word_routes.get_link_words(word)
-    except Exception:
-        logger.exception("Error getting linked words")
+    corpus_examples, linked_words = await asyncio.gather(
+        _with_deadline(
+            examples_db.get_corpus_examples(
+                word=word,
+                mycorp=settings.VIEW_CORPUS_LANG,
+                pages_count=settings.VIEW_CORPUS_PAGES_COUNT
+            ),
+            settings.VIEW_CORPUS_EXAMPLES_TIMEOUT,
+            'corpus examples'
+        ),
+        _with_deadline(
+            words_db.get_linked_words(word),
+            settings.VIEW_LINKED_WORDS_TIMEOUT,
+            'linked words'
+        )
+    )
+    if corpus_examples is not None:
+        corpus_examples.sort(key=lambda ex: len(ex.original))
 
     context = {
         'request': request,
         'word': word,
-        'corpus_examples': corpus_examples.get('examples', []),
-        'linked_words': linked_words.get('synonyms', [])
+        **_render_sections(
+            word=word,
+            corpus_examples=corpus_examples,
+            linked_words=linked_words
+        )
     }
 
-    return templates.TemplateResponse('view.html', context)
+    return templates().TemplateResponse('view.html', context)
@@ -1,18 +1,58 @@
-from typing import Optional
+import base64
+import datetime
+from typing import AsyncIterator, Literal, Optional
 from uuid import UUID
 
-import aiohttp
 import sqlalchemy.sql as sa
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID, insert
 from sqlalchemy.engine import RowMapping
 
-from vocabulary.common import database, settings
+from vocabulary.common import breaker, cache, database, http, metrics, ratelimit, settings, singleflight
 from vocabulary.common.log import logger
 from vocabulary.models import models
+from vocabulary.words import lemmas, repetition
+from vocabulary.words.search import prefix_index
 
 
+# rows per INSERT, asyncpg allows up to 32767 bind params
+BULK_CHUNK_SIZE = 5000
+# rows fetched from the server-side cursor at once
+EXPORT_BATCH_SIZE = 1000
+# language of the rusvectores model
+SYNONYMS_LANG = 'ru'
+
+linked_words_cache = cache.create_cache(
+    'linked_words',
+    maxsize=settings.CACHE_LINKED_WORDS_SIZE,
+    ttl=settings.CACHE_LINKED_WORDS_TTL,
+    slot_size=1024
+)
+linked_words_flight = singleflight.SingleFlight()
+metrics.register_cache('linked_words', linked_words_cache)
+metrics.register_flight('linked_words', linked_words_flight)
+rusvectores_limiter = ratelimit.RateLimiter(
+    'rusvectores',
+    rate=settings.RATE_LIMIT_RUSVECTORES_RATE,
+    burst=settings.RATE_LIMIT_RUSVECTORES_BURST,
+    concurrency=settings.RATE_LIMIT_RUSVECTORES_CONCURRENCY,
+    max_wait=settings.RATE_LIMIT_MAX_WAIT
+)
+rusvectores_breaker = breaker.CircuitBreaker(
+    'rusvectores',
+    failure_threshold=settings.BREAKER_FAILURE_THRESHOLD,
+    reset_timeout=settings.BREAKER_RESET_TIMEOUT,
+    ignore=(ratelimit.RateLimitExceeded, )
+)
+
+
+@rusvectores_breaker.guard
+@rusvectores_limiter.limit
+@metrics.timed(metrics.UPSTREAM_LATENCY, upstream='rusvectores')
 async def _get_json(url: str):
-    async with aiohttp.ClientSession() as ses:
+    async with http.client() as ses:
         async with ses.get(url) as resp:
+            # error pages are failures of rusvectores, not empty results
+            resp.raise_for_status()
             try:
                 json = await resp.json()
             except Exception as e:
@@ -21,8 +61,18 @@ async def _get_json(url: str):
             return json
 
 
-async def get_linked_words(word: str) -> list[str]:
-    word = word.lower().strip()
+def _normalize(word: str) -> str:
+    return word.lower().strip()
+
+
+def linked_words_key(word: str) -> str:
+    """ Linked words are stored by the lemma of the normalized word,
+    the model of rusvectores is Russian, so the other words stay as they are.
+    """
+    return lemmas.lemmatize(_normalize(word), SYNONYMS_LANG)
+
+
+async def _request_linked_words(word: str) -> list[str]:
     url = settings.SYNONYMS_SEARCH_URL.format(word=word)
 
     resp = await _get_json(url)
@@ -40,15 +90,165 @@ async def get_linked_words(word: str) -> list[str]:
         return words
 
 
+async def _get_stored_linked_words(word: str,
+                                   *,
+                                   with_expired: bool = False) -> Optional[list[str]]:
+    stmt = sa.select(models.LinkedWords.c.synonyms)\
+        .where(models.LinkedWords.c.word == word)
+
+    if not with_expired:
+        now = datetime.datetime.utcnow()
+        # words without synonyms are requested again sooner
+        expired_at = sa.case(
+            (sa.func.cardinality(models.LinkedWords.c.synonyms) == 0,
+             now - datetime.timedelta(seconds=settings.CACHE_LINKED_WORDS_EMPTY_DB_TTL)),
+            else_=now - datetime.timedelta(seconds=settings.CACHE_LINKED_WORDS_DB_TTL)
+        )
+        stmt = stmt.where(models.LinkedWords.c.fetched_at >= expired_at)
+
+    try:
+        async with database.session() as ses:
+            return (await ses.execute(stmt)).scalar_one_or_none()
+    except database.DatabaseError:
+        return None
+
+
+async def _store_linked_words(word: str,
+                              synonyms: list[str]) -> None:
+    stmt = insert(models.LinkedWords)\
+        .values(word=word, synonyms=synonyms, fetched_at=datetime.datetime.utcnow())
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.LinkedWords.c.word],
+        set_={
+            'synonyms': stmt.excluded.synonyms,
+            'fetched_at': stmt.excluded.fetched_at
+        }
+    )
+
+    try:
+        async with database.session() as ses:
+            await ses.execute(stmt)
+    except database.DatabaseError:
+        pass
+
+
+async def _load_linked_words(word: str) -> tuple[str, ...]:
+    if (synonyms := await _get_stored_linked_words(word)) is None:
+        try:
+            synonyms = await _request_linked_words(word)
+        except breaker.CircuitOpen:
+            # expired synonyms are better than none while rusvectores is down
+            if (synonyms := await _get_stored_linked_words(word, with_expired=True)) is None:
+                raise
+            return tuple(synonyms)
+        # errors of rusvectores are raised, so an empty result means
+        # there're no synonyms, e.g. of English words, it's stored too
+        await _store_linked_words(word, synonyms)
+
+    linked_words_cache.set(word, tuple(synonyms))
+    return tuple(synonyms)
+
+
+async def get_linked_words(word: str) -> list[str]:
+    """ Read-through: memory (the process or the node) -> database -> rusvectores """
+    word = linked_words_key(word)
+
+    if (synonyms := linked_words_cache.get(word)) is None:
+        synonyms = await linked_words_flight.do(
+            word, lambda: _load_linked_words(word))
+
+    return list(synonyms)
+
+
+def encode_cursor(word: RowMapping) -> str:
+    # added_at is nullable, the words without it are the last ones
+    added_at = word['added_at'].isoformat() if word['added_at'] is not None else ''
+    cursor = f"{added_at}|{word['word_id']}"
+    return base64.urlsafe_b64encode(cursor.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[Optional[datetime.datetime], str]:
+    """
+    :exception ValueError: if the cursor is invalid.
+    """
+    try:
+        added_at, word_id = base64.urlsafe_b64decode(cursor.encode())\
+            .decode().split('|')
+        return datetime.datetime.fromisoformat(added_at) if added_at else None, str(UUID(word_id))
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+
 async def get_words_to_learn(*,
                              limit: Optional[int] = None,
-                             offset: Optional[int] = None) -> list[RowMapping]:
+                             offset: Optional[int] = None,
+                             after: Optional[tuple[Optional[datetime.datetime], str]] = None) -> list[RowMapping]:
+    """ Words ordered by (added_at, word_id), the ones without added_at are the last.
+
+    :param after: the key of the last word of the previous page,
+    it's the fast way to skip the rows instead of the offset.
+    """
+    added_at, word_id = models.WordToLearn.c.added_at, models.WordToLearn.c.word_id
     stmt = sa.select(models.WordToLearn)\
-        .order_by(models.WordToLearn.c.added_at)\
-        .limit(limit).offset(offset)
+        .order_by(added_at.asc().nulls_last(), word_id)\
+        .offset(offset)
 
+    if after is None:
+        stmts = [stmt]
+    elif after[0] is None:
+        stmts = [stmt.where(added_at.is_(None), word_id > after[1])]
+    else:
+        # the row comparison is the only predicate to be the index condition,
+        # it excludes the words without added_at, they're got when the others run out
+        stmts = [
+            stmt.where(sa.tuple_(added_at, word_id) > after),
+            stmt.where(added_at.is_(None))
+        ]
+
+    words: list[RowMapping] = []
     async with database.session() as ses:
-        return (await ses.execute(stmt)).mappings().all()
+        for stmt in stmts:
+            if limit is not None and len(words) >= limit:
+                break
+            stmt = stmt.limit(None if limit is None else limit - len(words))
+            words += (await ses.execute(stmt)).mappings().all()
+
+    return words
+
+
+async def get_words_to_learn_count() -> int:
+    """ Approximate count from the planner statistics,
+    the exact one if the table hasn't been analyzed yet.
+    """
+    estimate_stmt = sa.text("SELECT reltuples::bigint FROM pg_class "
+                            "WHERE oid = CAST(:table AS regclass)")\
+        .bindparams(table=models.WordToLearn.name)
+    count_stmt = sa.select(sa.func.count()).select_from(models.WordToLearn)
+
+    async with database.session() as ses:
+        if (estimate := (await ses.execute(estimate_stmt)).scalar_one_or_none()) and estimate > 0:
+            return estimate
+        return (await ses.execute(count_stmt)).scalar_one()
+
+
+async def iter_words(*,
+                     source: Literal['to-learn', 'words'],
+                     batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[list[RowMapping]]:
+    """ Stream all the words ordered by adding time with a server-side
+    cursor, not more than batch_size rows are held in memory.
+    """
+    if source == 'words':
+        stmt = sa.select([models.Word.c.word, models.Word.c.added_at,
+                          models.Word.c.eng_t, models.Word.c.rus_t])\
+            .order_by(models.Word.c.added_at, models.Word.c.word_id)
+    else:
+        stmt = sa.select([models.WordToLearn.c.word, models.WordToLearn.c.added_at])\
+            .order_by(models.WordToLearn.c.added_at, models.WordToLearn.c.word_id)
+
+    async with database.session() as ses:
+        result = await ses.stream(stmt.execution_options(yield_per=batch_size))
+        async for batch in result.mappings().partitions(batch_size):
+            yield batch
 
 
 async def delete_word_to_learn(*,
@@ -58,7 +258,11 @@ async def delete_word_to_learn(*,
         .where(models.WordToLearn.c.word_id == str(word_id))
 
     async with database.session() as ses:
-        return (await ses.execute(stmt)).mappings().one_or_none()
+        word = (await ses.execute(stmt)).mappings().one_or_none()
+
+    if word is not None:
+        prefix_index.discard(word['word'])
+    return word
 
 
 async def add_word_to_learn(*,
@@ -68,3 +272,108 @@ async def add_word_to_learn(*,
 
     async with database.session() as ses:
         await ses.execute(stmt)
+
+    prefix_index.add(word)
+
+
+async def add_words_to_learn(*,
+                             words: list[str]) -> set[str]:
+    """ Insert the words in one transaction, skip existing ones.
+
+    :return: the inserted words.
+    """
+    inserted: set[str] = set()
+
+    async with database.session() as ses:
+        for start in range(0, len(words), BULK_CHUNK_SIZE):
+            chunk = words[start:start + BULK_CHUNK_SIZE]
+            stmt = insert(models.WordToLearn)\
+                .values([{'word': word} for word in chunk])\
+                .on_conflict_do_nothing(index_elements=[models.WordToLearn.c.word])\
+                .returning(models.WordToLearn.c.word)
+
+            inserted.update((await ses.execute(stmt)).scalars())
+
+    prefix_index.update(inserted)
+    return inserted
+
+
+async def delete_words_to_learn(*,
+                                word_ids: list[UUID]) -> set[UUID]:
+    """
+    :return: ids of the deleted words.
+    """
+    if not word_ids:
+        return set()
+
+    ids = sa.bindparam('word_ids', [str(word_id) for word_id in word_ids],
+                       type_=ARRAY(PG_UUID))
+    stmt = sa.delete(models.WordToLearn)\
+        .returning(models.WordToLearn.c.word_id, models.WordToLearn.c.word)\
+        .where(models.WordToLearn.c.word_id == sa.any_(ids))
+
+    async with database.session() as ses:
+        deleted = (await ses.execute(stmt)).all()
+
+    for _, word in deleted:
+        prefix_index.discard(word)
+    return {
+        UUID(word_id)
+        for word_id, _ in deleted
+    }
+
+
+async def get_due_words(*,
+                        limit: int) -> list[RowMapping]:
+    """ Words to repeat, the most overdue first """
+    now = datetime.datetime.utcnow()
+    stmt = sa.select(models.WordToLearn)\
+        .where(models.WordToLearn.c.due_at.isnot(None))\
+        .where(models.WordToLearn.c.due_at <= now)\
+        .order_by(models.WordToLearn.c.due_at)\
+        .limit(limit)
+
+    async with database.session() as ses:
+        return (await ses.execute(stmt)).mappings().all()
+
+
+async def review_words(*,
+                       reviews: dict[UUID, int]) -> dict[UUID, dict]:
+    """ Reschedule the words in one transaction.
+
+    :param reviews: word id -> quality of the answer, 0-5.
+    :return: word id -> new repetition state, only for the found words.
+    """
+    if not reviews:
+        return {}
+
+    ids = sa.bindparam('word_ids', [str(word_id) for word_id in reviews],
+                       type_=ARRAY(PG_UUID))
+    select_stmt = sa.select(models.WordToLearn.c.word_id,
+                            models.WordToLearn.c.ease,
+                            models.WordToLearn.c.interval_days,
+                            models.WordToLearn.c.repetitions)\
+        .where(models.WordToLearn.c.word_id == sa.any_(ids))\
+        .with_for_update()
+    update_stmt = sa.update(models.WordToLearn)\
+        .where(models.WordToLearn.c.word_id == sa.bindparam('b_word_id'))\
+        .values(ease=sa.bindparam('b_ease'),
+                interval_days=sa.bindparam('b_interval_days'),
+                repetitions=sa.bindparam('b_repetitions'),
+                due_at=sa.bindparam('b_due_at'))
+
+    now = datetime.datetime.utcnow()
+    async with database.session() as ses:
+        states = {
+            UUID(word_id): repetition.schedule(
+                ease=ease, interval_days=interval_days, repetitions=repetitions,
+                quality=reviews[UUID(word_id)], now=now)
+            for word_id, ease, interval_days, repetitions in (await ses.execute(select_stmt)).all()
+        }
+        if states:
+            await ses.execute(update_stmt, [
+                {'b_word_id': str(word_id), **{f"b_{key}": value for key, value in state.items()}}
+                for word_id, state in states.items()
+            ])
+
+    return states
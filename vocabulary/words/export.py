@@ -0,0 +1,203 @@
+""" Export the vocabulary to csv, xlsx and docx
+with bounded memory, the rows are streamed from the database.
+
+csv is sent while being written. xlsx and docx are zip archives,
+they're written to a temporary file and sent in chunks.
+"""
+import asyncio
+import csv
+import io
+import os
+import tempfile
+import zipfile
+from typing import Any, AsyncIterator, Literal
+from xml.sax.saxutils import escape
+
+from sqlalchemy.engine import RowMapping
+
+from vocabulary.words import db
+
+
+FORMATS = Literal['csv', 'xlsx', 'docx']
+SOURCES = Literal['to-learn', 'words']
+
+MEDIA_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+# bytes sent at once
+CHUNK_SIZE = 64 * 1024
+WORDPROCESSINGML = 'http://schemas.openxmlformats.org/wordprocessingml/2006/main'
+FONT_NAME = 'Avenir Next Cyr'
+FONT_SIZE = 16
+
+
+def _columns(source: SOURCES) -> tuple[str, ...]:
+    if source == 'words':
+        return 'word', 'added_at', 'eng_t', 'rus_t'
+    return 'word', 'added_at'
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return '; '.join(value)
+    if hasattr(value, 'isoformat'):
+        return value.isoformat(sep=' ', timespec='seconds')
+    return str(value)
+
+
+def _row(word: RowMapping,
+         columns: tuple[str, ...]) -> list[str]:
+    return [_cell(word[column]) for column in columns]
+
+
+async def csv_chunks(source: SOURCES) -> AsyncIterator[bytes]:
+    columns = _columns(source)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    # BOM for Excel to detect utf-8
+    buffer.write('\ufeff')
+    writer.writerow(columns)
+    async for batch in db.iter_words(source=source):
+        writer.writerows(_row(word, columns) for word in batch)
+
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    if tail := buffer.getvalue():
+        yield tail.encode('utf-8')
+
+
+async def write_xlsx(source: SOURCES,
+                     path: str) -> None:
+    # it isn't needed at startup, it's imported on the first export
+    import xlsxwriter
+
+    columns = _columns(source)
+    # constant_memory flushes every row to the disk once the next one is started
+    workbook = xlsxwriter.Workbook(path, {'constant_memory': True})
+    try:
+        sheet = workbook.add_worksheet('Vocabulary')
+        sheet.write_row(0, 0, columns, workbook.add_format({'bold': True}))
+
+        row_num = 1
+        async for batch in db.iter_words(source=source):
+            rows = [_row(word, columns) for word in batch]
+
+            def _write(rows: list[list[str]] = rows, start: int = row_num) -> None:
+                for num, row in enumerate(rows, start):
+                    sheet.write_row(num, 0, row)
+
+            await asyncio.to_thread(_write)
+            row_num += len(rows)
+    finally:
+        await asyncio.to_thread(workbook.close)
+
+
+_DOCX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+</Types>"""
+
+_DOCX_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+_DOCX_HEAD = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:document xmlns:w="{WORDPROCESSINGML}"><w:body>"""
+
+_DOCX_TAIL = """<w:sectPr/></w:body></w:document>"""
+
+
+def _docx_run(text: str,
+              *,
+              bold: bool = False,
+              size: int = FONT_SIZE) -> str:
+    # the size is in half-points
+    properties = f'<w:rFonts w:ascii="{FONT_NAME}" w:hAnsi="{FONT_NAME}" w:cs="{FONT_NAME}"/>' \
+                 f'<w:sz w:val="{size * 2}"/>'
+    if bold:
+        properties = f"<w:b/>{properties}"
+    return f'<w:r><w:rPr>{properties}</w:rPr><w:t xml:space="preserve">{escape(text)}</w:t></w:r>'
+
+
+def _docx_heading(text: str) -> str:
+    return f"<w:p>{_docx_run(text, bold=True, size=FONT_SIZE * 2)}</w:p>"
+
+
+def _docx_paragraph(num: int,
+                    word: RowMapping) -> str:
+    """ Enumerated and capitalized like src/docs/create_doc.create_docx """
+    text = word['word']
+    text = f"{text[:1].upper()}{text[1:]}"
+    if word.get('eng_t') or word.get('rus_t'):
+        definitions = '; '.join([*(word['eng_t'] or []), *(word['rus_t'] or [])])
+        text = f"{text} – {definitions}"
+
+    return f"<w:p>{_docx_run(f'{num}. ', bold=True)}{_docx_run(text)}</w:p>"
+
+
+async def write_docx(source: SOURCES,
+                     path: str) -> None:
+    """ Minimal WordprocessingML, the document part is
+    written and compressed while the rows are streamed.
+    """
+    with zipfile.ZipFile(path, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _DOCX_CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _DOCX_RELS)
+
+        with archive.open('word/document.xml', 'w', force_zip64=True) as document:
+            document.write(_DOCX_HEAD.encode('utf-8'))
+            document.write(_docx_heading('Vocabulary').encode('utf-8'))
+
+            num = 0
+            async for batch in db.iter_words(source=source):
+                paragraphs = []
+                for num, word in enumerate(batch, num + 1):
+                    paragraphs.append(_docx_paragraph(num, word))
+                await asyncio.to_thread(document.write, ''.join(paragraphs).encode('utf-8'))
+
+            document.write(_DOCX_TAIL.encode('utf-8'))
+
+
+async def file_chunks(path: str) -> AsyncIterator[bytes]:
+    with open(path, 'rb') as f:
+        while chunk := await asyncio.to_thread(f.read, CHUNK_SIZE):
+            yield chunk
+
+
+def remove_file(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+async def export_file(*,
+                      format: FORMATS,
+                      source: SOURCES) -> str:
+    """ Write the archive format to a temporary file.
+
+    :return: path to the file, it should be removed by remove_file.
+    """
+    fd, path = tempfile.mkstemp(suffix=f".{format}")
+    os.close(fd)
+
+    try:
+        if format == 'xlsx':
+            await write_xlsx(source, path)
+        else:
+            await write_docx(source, path)
+    except BaseException:
+        remove_file(path)
+        raise
+
+    return path
@@ -0,0 +1,109 @@
+""" Word form -> lemma map built from the found word forms
+of the corpus examples, so that the inflected forms share
+the cached data of their lemma.
+
+The map is kept per language: Russian forms are found in
+every parallel corpus, the others belong to the language
+of the corpus they're found in.
+"""
+import re
+from typing import Iterable
+
+import sqlalchemy.sql as sa
+from sqlalchemy.dialects.postgresql import insert
+
+from vocabulary.common import database
+from vocabulary.common.log import logger
+from vocabulary.models import models
+
+
+CYRILLIC = re.compile(r'[а-яё]')
+
+# language -> form -> lemma
+_lemmas: dict[str, dict[str, str]] = {}
+# language -> words requested by themselves, they aren't merged into another lemma
+_own_lemmas: dict[str, set[str]] = {}
+
+
+def language(word: str,
+             mycorp: str) -> str:
+    return 'ru' if CYRILLIC.search(word) else mycorp
+
+
+def lemmatize(word: str,
+              mycorp: str) -> str:
+    return _lemmas.get(language(word, mycorp), {}).get(word, word)
+
+
+def _same_script(form: str,
+                 lemma: str) -> bool:
+    """ Parallel examples might mark the words of the translation too """
+    return bool(CYRILLIC.search(form)) == bool(CYRILLIC.search(lemma))
+
+
+def _new_forms(lemma: str,
+               forms: Iterable[str],
+               lang: str) -> dict[str, str]:
+    lemmas = _lemmas.get(lang, {})
+    own_lemmas = _own_lemmas.get(lang, set())
+    # a form isn't a lemma to avoid chains of forms
+    if lemma in lemmas:
+        return {}
+
+    new_forms = {}
+    for form in forms:
+        form = form.lower().strip()
+        # a homograph requested by itself (saw, left) keeps its own data
+        if not form or form == lemma or form in lemmas or form in own_lemmas:
+            continue
+        if _same_script(form, lemma):
+            new_forms[form] = lemma
+
+    return new_forms
+
+
+def _remember(lang: str,
+              forms: dict[str, str]) -> None:
+    _lemmas.setdefault(lang, {}).update(forms)
+    _own_lemmas.setdefault(lang, set()).update(forms.values())
+
+
+async def add_forms(lemma: str,
+                    forms: Iterable[str],
+                    mycorp: str) -> None:
+    """ Remember the forms found for the lemma, known forms keep their lemma """
+    lang = language(lemma, mycorp)
+    _own_lemmas.setdefault(lang, set()).add(lemma)
+
+    if not (new_forms := _new_forms(lemma, forms, lang)):
+        return
+
+    _remember(lang, new_forms)
+
+    stmt = insert(models.WordForm)\
+        .values([{'lang': lang, 'word_form': form, 'lemma': lemma} for form, lemma in new_forms.items()])\
+        .on_conflict_do_nothing(index_elements=[models.WordForm.c.lang, models.WordForm.c.word_form])
+
+    try:
+        async with database.session() as ses:
+            await ses.execute(stmt)
+    except database.DatabaseError:
+        pass
+
+    logger.debug("%s new forms of '%s' added", len(new_forms), lemma)
+
+
+async def load() -> None:
+    stmt = sa.select(models.WordForm.c.lang, models.WordForm.c.word_form, models.WordForm.c.lemma)
+
+    try:
+        async with database.session() as ses:
+            rows = (await ses.execute(stmt)).all()
+    except database.DatabaseError:
+        logger.error("Word forms aren't loaded")
+        return
+
+    for lang, form, lemma in rows:
+        _remember(lang, {form: lemma})
+
+    logger.info("%s word forms loaded", len(rows))
@@ -0,0 +1,153 @@
+""" Background worker warming the view data of the new words """
+import asyncio
+from typing import Iterable, Optional
+
+import sqlalchemy.sql as sa
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from vocabulary.common import database, settings
+from vocabulary.common.log import logger
+from vocabulary.examples import db as examples_db
+from vocabulary.models import models
+from vocabulary.words import db as words_db
+
+
+# the not fetched words are scanned by one worker of all
+SCAN_LOCK_ID = 0x766f6361
+
+_queue: Optional[asyncio.Queue] = None
+_workers: list[asyncio.Task] = []
+_scan_task: Optional[asyncio.Task] = None
+
+
+def enqueue(words: Iterable[str]) -> None:
+    """ Words are dropped if the worker isn't started or the queue is full """
+    if _queue is None:
+        return
+
+    for word in words:
+        try:
+            _queue.put_nowait(word)
+        except asyncio.QueueFull:
+            logger.warning("Prefetch queue is full, '%s' skipped", word)
+            return
+
+
+async def _prefetch(word: str) -> None:
+    results = await asyncio.gather(
+        examples_db.get_corpus_examples(
+            word=word,
+            mycorp=settings.VIEW_CORPUS_LANG,
+            pages_count=settings.VIEW_CORPUS_PAGES_COUNT
+        ),
+        words_db.get_linked_words(word),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.warning("Error prefetching '%s': %s", word, repr(result))
+
+
+async def _worker(queue: asyncio.Queue) -> None:
+    while True:
+        word = await queue.get()
+        try:
+            await _prefetch(word)
+        finally:
+            queue.task_done()
+
+
+async def _get_not_fetched_words() -> list[str]:
+    """ Words added bypassing the API, e.g. by the migrator """
+    # the lowered words are filtered in the database,
+    # the inflected ones are stored by their lemmas
+    fetched = sa.select(models.LinkedWords.c.word)\
+        .where(models.LinkedWords.c.word == sa.func.lower(sa.func.trim(models.WordToLearn.c.word)))
+    stmt = sa.select(models.WordToLearn.c.word)\
+        .where(~fetched.exists())\
+        .order_by(models.WordToLearn.c.added_at)\
+        .limit(settings.PREFETCH_QUEUE_SIZE)
+
+    try:
+        async with database.session() as ses:
+            words = (await ses.execute(stmt)).scalars().all()
+
+            keys = {word: words_db.linked_words_key(word) for word in words}
+            stmt = sa.select(models.LinkedWords.c.word)\
+                .where(models.LinkedWords.c.word.in_(set(keys.values())))
+            fetched_keys = set((await ses.execute(stmt)).scalars().all())
+    except database.DatabaseError:
+        return []
+
+    return [word for word, key in keys.items() if key not in fetched_keys]
+
+
+async def _scan(queue: asyncio.Queue,
+                conn: AsyncConnection) -> None:
+    """ Enqueue the not fetched words every interval while the lock is held,
+    the queue is drained first not to enqueue the same words again.
+    """
+    while True:
+        # the lock is gone with the connection
+        await conn.scalar(sa.select(1))
+
+        if queue.empty():
+            words = await _get_not_fetched_words()
+            enqueue(words)
+            logger.info("%s not fetched words enqueued", len(words))
+
+        await asyncio.sleep(settings.PREFETCH_SCAN_INTERVAL)
+
+
+async def _scan_forever(queue: asyncio.Queue) -> None:
+    """ The worker which got the lock scans the not fetched words,
+    the others try to get it every interval in case the one stops.
+    """
+    while True:
+        try:
+            # the session lock is held outside a transaction
+            # not to keep a snapshot while the words are prefetched
+            async with database.engine.connect() as conn:
+                conn = await conn.execution_options(isolation_level='AUTOCOMMIT')
+                if await conn.scalar(sa.select(sa.func.pg_try_advisory_lock(SCAN_LOCK_ID))):
+                    try:
+                        await _scan(queue, conn)
+                    finally:
+                        await conn.scalar(sa.select(sa.func.pg_advisory_unlock(SCAN_LOCK_ID)))
+                else:
+                    logger.debug("Not fetched words are scanned by another worker")
+        except Exception as e:
+            logger.error("Error scanning not fetched words: %s", repr(e))
+
+        await asyncio.sleep(settings.PREFETCH_SCAN_INTERVAL)
+
+
+async def startup() -> None:
+    global _queue, _scan_task
+
+    if _queue is not None:
+        return
+
+    _queue = asyncio.Queue(maxsize=settings.PREFETCH_QUEUE_SIZE)
+    _workers.extend(
+        asyncio.create_task(_worker(_queue))
+        for _ in range(settings.PREFETCH_CONCURRENCY)
+    )
+    if _workers:
+        _scan_task = asyncio.create_task(_scan_forever(_queue))
+    logger.info("Prefetch worker started")
+
+
+async def shutdown() -> None:
+    global _queue, _scan_task
+
+    for worker in _workers:
+        worker.cancel()
+    _workers.clear()
+    _queue = None
+
+    if _scan_task is not None:
+        # the lock is released before the pool is closed
+        _scan_task.cancel()
+        await asyncio.gather(_scan_task, return_exceptions=True)
+        _scan_task = None
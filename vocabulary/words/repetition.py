@@ -0,0 +1,48 @@
+""" SM-2 spaced repetition """
+import datetime
+from typing import Any, Optional
+
+from vocabulary.common import settings
+
+
+MIN_EASE = 1.3
+
+
+def schedule(*,
+             ease: float,
+             interval_days: int,
+             repetitions: int,
+             quality: int,
+             now: Optional[datetime.datetime] = None) -> dict[str, Any]:
+    """ Get the next repetition state.
+
+    :param quality: int, 0-5, how well the word is remembered,
+    the word is repeated from the start with the same ease if it's less than 3.
+    :return: ease, interval_days, repetitions and due_at,
+    due_at is None if the word is learned.
+    """
+    now = now or datetime.datetime.utcnow()
+
+    if quality < 3:
+        repetitions, interval_days = 0, 1
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval_days = 1
+        elif repetitions == 2:
+            interval_days = 6
+        else:
+            interval_days = round(interval_days * ease)
+
+        ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+    due_at: Optional[datetime.datetime] = now + datetime.timedelta(days=interval_days)
+    if interval_days > settings.REPETITION_MAX_INTERVAL:
+        due_at = None
+
+    return {
+        'ease': ease,
+        'interval_days': interval_days,
+        'repetitions': repetitions,
+        'due_at': due_at
+    }
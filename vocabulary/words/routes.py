@@ -1,8 +1,12 @@
+import os
+from typing import Optional
 from uuid import UUID
 
 from fastapi import APIRouter, Query, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
-from vocabulary.words import schemas, db
+from vocabulary.words import schemas, db, export, prefetch, search
 
 
 router = APIRouter(
@@ -14,16 +18,41 @@ router = APIRouter(
 @router.get('/to-learn/list',
             response_model=schemas.WordsToLearnListing)
 async def get_words_to_learn(p: int = Query(1, ge=1),
-                             page_size: int = Query(10, ge=1)):
-    """ List words to learn """
-    offset = (p - 1) * page_size
-
+                             page_size: int = Query(10, ge=1),
+                             cursor: Optional[str] = None,
+                             with_total: bool = False):
+    """ List words to learn.
+
+    Pass the 'next' cursor from the previous page instead of
+    the page number, it doesn't slow down on deep pages.
+    """
+    offset: Optional[int] = (p - 1) * page_size
+    after = None
+    if cursor:
+        try:
+            after = db.decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=422, detail="Invalid cursor")
+        offset = None
+
+    # the extra word shows whether the next page exists
     words = await db.get_words_to_learn(
-        limit=page_size, offset=offset
+        limit=page_size + 1, offset=offset, after=after
     )
 
+    next_cursor = None
+    if len(words) > page_size:
+        words = words[:page_size]
+        next_cursor = db.encode_cursor(words[-1])
+
+    total = None
+    if with_total:
+        total = await db.get_words_to_learn_count()
+
     return {
-        'words': words
+        'words': words,
+        'next': next_cursor,
+        'total': total
     }
 
 
@@ -31,6 +60,69 @@ async def get_words_to_learn(p: int = Query(1, ge=1),
 async def add_word_to_learn(word: schemas.WordToLearn):
     """ Add word to learn """
     await db.add_word_to_learn(word=word.word)
+    prefetch.enqueue([word.word])
+
+
+@router.post('/to-learn/add/bulk',
+             response_model=schemas.BulkOutcome)
+async def add_words_to_learn(words: schemas.WordsToLearn):
+    """ Add words to learn, existing ones are skipped """
+    unique_words = list(dict.fromkeys(words.words))
+    added = await db.add_words_to_learn(words=unique_words)
+    prefetch.enqueue(added)
+
+    return {
+        'items': [
+            {'item': word, 'status': 'added' if word in added else 'exists'}
+            for word in unique_words
+        ],
+        'count': len(added)
+    }
+
+
+@router.post('/to-learn/delete/bulk',
+             response_model=schemas.BulkOutcome)
+async def remove_words_to_learn(word_ids: schemas.WordToLearnIds):
+    """ Remove the words """
+    unique_ids = list(dict.fromkeys(word_ids.word_ids))
+    deleted = await db.delete_words_to_learn(word_ids=unique_ids)
+
+    return {
+        'items': [
+            {'item': str(word_id), 'status': 'deleted' if word_id in deleted else 'not_found'}
+            for word_id in unique_ids
+        ],
+        'count': len(deleted)
+    }
+
+
+@router.get('/to-learn/due',
+            response_model=schemas.DueWords)
+async def get_due_words(limit: int = Query(10, ge=1, le=1000)):
+    """ Words to repeat now, the most overdue first """
+    return {
+        'words': await db.get_due_words(limit=limit)
+    }
+
+
+@router.post('/to-learn/review',
+             response_model=schemas.ReviewOutcomes)
+async def review_words(reviews: schemas.Reviews):
+    """ Submit answers, the last one wins for repeated words """
+    qualities = {
+        review.word_id: review.quality
+        for review in reviews.reviews
+    }
+    states = await db.review_words(reviews=qualities)
+
+    return {
+        'items': [
+            {'word_id': word_id, 'status': 'reviewed', **states[word_id]}
+            if word_id in states else
+            {'word_id': word_id, 'status': 'not_found'}
+            for word_id in qualities
+        ]
+    }
 
 
 @router.delete('/to-learn/{word_id}',
@@ -43,6 +135,26 @@ async def remove_word_to_learn(word_id: UUID):
     return word
 
 
+@router.get('/search',
+            response_model=schemas.SearchResult)
+async def search_words(q: str = Query(..., min_length=1),
+                       limit: int = Query(10, ge=1, le=100),
+                       fuzzy: bool = False):
+    """ Autocomplete by the prefix from memory,
+    typo-tolerant search through the trigram indexes if fuzzy.
+    """
+    q = q.strip()
+    similar = []
+    if fuzzy:
+        similar = await search.search_similar(q, limit=limit)
+
+    return {
+        'query': q,
+        'prefix': search.prefix_index.search(q, limit=limit),
+        'similar': similar
+    }
+
+
 @router.get('/linked-words/{word}',
             response_model=schemas.LinkedWords)
 async def get_link_words(word: str):
@@ -52,3 +164,29 @@ async def get_link_words(word: str):
         "word": word,
         "synonyms": synonyms
     }
+
+
+@router.get('/export',
+            response_class=StreamingResponse,
+            responses={200: {'content': {media_type: {} for media_type in export.MEDIA_TYPES.values()}}})
+async def export_words(format: export.FORMATS = Query('csv'),
+                       source: export.SOURCES = Query('to-learn')):
+    """ Download the words to learn or the dictionary,
+    the rows are streamed, the memory is bounded.
+    """
+    headers = {'Content-Disposition': f'attachment; filename="vocabulary-{source}.{format}"'}
+
+    if format == 'csv':
+        return StreamingResponse(
+            export.csv_chunks(source),
+            media_type=export.MEDIA_TYPES[format],
+            headers=headers
+        )
+
+    path = await export.export_file(format=format, source=source)
+    return StreamingResponse(
+        export.file_chunks(path),
+        media_type=export.MEDIA_TYPES[format],
+        headers={**headers, 'Content-Length': str(os.path.getsize(path))},
+        background=BackgroundTask(export.remove_file, path)
+    )
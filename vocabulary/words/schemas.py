@@ -1,7 +1,8 @@
 import datetime
+from typing import Literal, Optional
 from uuid import UUID
 
-from pydantic import BaseModel, constr
+from pydantic import BaseModel, conint, constr
 
 
 class WordToLearn(BaseModel):
@@ -10,11 +11,80 @@ class WordToLearn(BaseModel):
 
 class WordToLearnResponse(WordToLearn):
     word_id: UUID
-    added_at: datetime.datetime
+    # None for the words migrated without it
+    added_at: Optional[datetime.datetime]
 
 
 class WordsToLearnListing(BaseModel):
     words: list[WordToLearnResponse]
+    # cursor of the next page, None if it's the last one
+    next: Optional[str] = None
+    # approximate count of all words
+    total: Optional[int] = None
+
+
+class WordsToLearn(BaseModel):
+    words: list[constr(strip_whitespace=True, min_length=1)] # type: ignore
+
+
+class WordToLearnIds(BaseModel):
+    word_ids: list[UUID]
+
+
+class BulkItemOutcome(BaseModel):
+    item: str
+    status: Literal['added', 'exists', 'deleted', 'not_found']
+
+
+class BulkOutcome(BaseModel):
+    items: list[BulkItemOutcome]
+    # count of added or deleted items
+    count: int
+
+
+class DueWord(WordToLearnResponse):
+    due_at: datetime.datetime
+    repetitions: int
+
+
+class DueWords(BaseModel):
+    words: list[DueWord]
+
+
+class Review(BaseModel):
+    word_id: UUID
+    # 0-5, how well the word is remembered
+    quality: conint(ge=0, le=5) # type: ignore
+
+
+class Reviews(BaseModel):
+    reviews: list[Review]
+
+
+class ReviewOutcome(BaseModel):
+    word_id: UUID
+    status: Literal['reviewed', 'not_found']
+    # None if the word is learned
+    due_at: Optional[datetime.datetime] = None
+    interval_days: Optional[int] = None
+    ease: Optional[float] = None
+
+
+class ReviewOutcomes(BaseModel):
+    items: list[ReviewOutcome]
+
+
+class SimilarWord(BaseModel):
+    word: str
+    similarity: float
+
+
+class SearchResult(BaseModel):
+    query: str
+    # words starting with the query
+    prefix: list[str]
+    # typo-tolerant matches, empty if fuzzy search is off
+    similar: list[SimilarWord] = []
 
 
 class LinkedWords(BaseModel):
@@ -0,0 +1,218 @@
+import asyncio
+import heapq
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Callable, Iterable, Iterator, Optional
+
+import sqlalchemy.sql as sa
+from sqlalchemy.engine import RowMapping
+
+from vocabulary.common import database, settings
+from vocabulary.common.log import logger
+from vocabulary.models import models
+
+
+Key = tuple[str, str]
+
+
+def _contains(keys: list[Key],
+              key: Key) -> bool:
+    return (index := bisect_left(keys, key)) < len(keys) and keys[index] == key
+
+
+def _iter_from(keys: list[Key],
+               prefix: str) -> Iterator[Key]:
+    for index in range(bisect_left(keys, (prefix, '')), len(keys)):
+        yield keys[index]
+
+
+class PrefixIndex:
+    """ Sorted case-insensitive words for the prefix search.
+
+    New words go to a small sorted buffer, it's merged to the main
+    list once it's full, so an insert doesn't shift the whole list.
+    Discarded words are skipped until the next merge.
+    """
+
+    def __init__(self,
+                 buffer_size: int = 1024) -> None:
+        # sorted (lowered word, word) pairs
+        self._keys: list[Key] = []
+        self._buffer: list[Key] = []
+        self._buffer_size = buffer_size
+        # count of the discarded words still in the main list
+        self._discarded = 0
+        # a word might be stored in several tables
+        self._refs: dict[str, int] = {}
+        # the changes made while the words are loaded, they're replayed after the rebuild
+        self._journal: Optional[list[tuple[Callable[['PrefixIndex', str], None], str]]] = None
+
+    def add(self,
+            word: str) -> None:
+        if self._journal is not None:
+            self._journal += [(PrefixIndex._add, word)]
+        self._add(word)
+
+    def discard(self,
+                word: str) -> None:
+        if self._journal is not None:
+            self._journal += [(PrefixIndex._discard, word)]
+        self._discard(word)
+
+    def _add(self,
+             word: str) -> None:
+        if (refs := self._refs.get(word, 0)) == 0:
+            key = word.lower(), word
+            if _contains(self._keys, key):
+                # it was discarded, but not merged yet
+                self._discarded -= 1
+            else:
+                insort(self._buffer, key)
+        self._refs[word] = refs + 1
+        self._merge_if_full()
+
+    def _discard(self,
+                 word: str) -> None:
+        if (refs := self._refs.get(word, 0)) == 0:
+            return
+        if refs > 1:
+            self._refs[word] = refs - 1
+            return
+
+        del self._refs[word]
+        key = word.lower(), word
+        if _contains(self._buffer, key):
+            self._buffer.remove(key)
+        else:
+            self._discarded += 1
+        self._merge_if_full()
+
+    def update(self,
+               words: Iterable[str]) -> None:
+        for word in words:
+            self.add(word)
+
+    def start_journal(self) -> None:
+        """ Record the changes until the rebuild, the words are being loaded """
+        self._journal = []
+
+    def stop_journal(self) -> None:
+        self._journal = None
+
+    def rebuild(self,
+                words: Iterable[str]) -> None:
+        """ Replace the content, words might repeat.
+        The changes recorded since start_journal are replayed.
+        """
+        refs = Counter(words)
+        self._keys = sorted((word.lower(), word) for word in refs)
+        self._buffer = []
+        self._discarded = 0
+        self._refs = dict(refs)
+
+        journal, self._journal = self._journal or [], None
+        for change, word in journal:
+            change(self, word)
+
+    def search(self,
+               prefix: str,
+               limit: int = 10) -> list[str]:
+        prefix = prefix.lower()
+        result: list[str] = []
+
+        for key, word in heapq.merge(_iter_from(self._keys, prefix), _iter_from(self._buffer, prefix)):
+            if len(result) == limit or not key.startswith(prefix):
+                break
+            if word in self._refs:
+                result += [word]
+
+        return result
+
+    def _merge_if_full(self) -> None:
+        # the buffer grows with the index to keep the merges amortized
+        if max(len(self._buffer), self._discarded) < max(self._buffer_size, len(self._keys) // 64):
+            return
+
+        if self._discarded:
+            self._keys = [key for key in self._keys if key[1] in self._refs]
+        # timsort merges the two sorted runs in linear time
+        self._keys += self._buffer
+        self._keys.sort()
+        self._buffer = []
+        self._discarded = 0
+
+    def __len__(self) -> int:
+        return len(self._refs)
+
+
+prefix_index = PrefixIndex()
+_reload_task: Optional[asyncio.Task] = None
+
+
+async def load_prefix_index() -> None:
+    stmts = (
+        sa.select(models.Word.c.word).where(models.Word.c.word.isnot(None)),
+        sa.select(models.WordToLearn.c.word).where(models.WordToLearn.c.word.isnot(None))
+    )
+
+    # the words added or discarded while they're selected
+    # might be missed by the snapshot, they're replayed
+    prefix_index.start_journal()
+    try:
+        async with database.session() as ses:
+            words = [
+                word
+                for stmt in stmts
+                for word in (await ses.execute(stmt)).scalars()
+            ]
+        prefix_index.rebuild(words)
+    except database.DatabaseError:
+        logger.error("Prefix index isn't loaded")
+        return
+    finally:
+        prefix_index.stop_journal()
+
+    logger.info("Prefix index loaded, %s words", len(prefix_index))
+
+
+async def _reload_forever() -> None:
+    """ The index gets only this process's writes,
+    the ones of the migrator and other workers come with the reload.
+    """
+    while True:
+        await asyncio.sleep(settings.SEARCH_PREFIX_INDEX_RELOAD_INTERVAL)
+        await load_prefix_index()
+
+
+async def startup() -> None:
+    global _reload_task
+
+    await load_prefix_index()
+    if _reload_task is None and settings.SEARCH_PREFIX_INDEX_RELOAD_INTERVAL > 0:
+        _reload_task = asyncio.create_task(_reload_forever())
+
+
+async def shutdown() -> None:
+    global _reload_task
+
+    if _reload_task is not None:
+        _reload_task.cancel()
+        _reload_task = None
+
+
+async def search_similar(query: str,
+                         *,
+                         limit: int = 10) -> list[RowMapping]:
+    """ Typo-tolerant search over the trigram indexes """
+    selects = [
+        sa.select(table.c.word, sa.func.similarity(table.c.word, query).label('similarity'))
+        .where(table.c.word.op('%')(query))
+        for table in (models.Word, models.WordToLearn)
+    ]
+    union = sa.union(*selects).subquery()
+    stmt = sa.select(union)\
+        .order_by(union.c.similarity.desc(), union.c.word)\
+        .limit(limit)
+
+    async with database.session() as ses:
+        return (await ses.execute(stmt)).mappings().all()